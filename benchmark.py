@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Throughput benchmark of telegram_tools_cli.py against mock_bot_api.py, so
+changes can be measured without touching api.telegram.org.
+
+    python3 benchmark.py                               # every scenario
+    python3 benchmark.py -s dump-messages get-member --latency 40 --jitter 20
+    python3 benchmark.py --rate-limit-every 200 --json results.json
+
+Every scenario starts a fresh mock server and runs the real CLI code in a
+fresh interpreter, then reports items per second, the p50 / p99 latency
+of Bot API calls as the client sees them (including rate governor waits
+and retries after 429), the number of requests the server received and
+the peak resident memory of the CLI process.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_bot_api import MockBotApi
+
+BENCH_TOKEN = "123456:BENCHMARK"
+
+# argv templates ({tmp}, {users}, {messages}, {seconds} are filled in);
+# items are counted from the "result" event field 'count_field', or from
+# output lines starting with 'prefix', or as successful runs when 'repeat'
+SCENARIOS = {
+    "dump-messages": {
+        "argv": ["dump-messages", "-m", "{messages}", "-s", "1", "-o", "{tmp}/dump.jsonl",
+                 "-w", "8"],
+        "unit": "messages", "count_field": "written",
+    },
+    "dump-messages-batch": {
+        "argv": ["dump-messages", "-m", "{messages}", "-s", "1", "-o", "{tmp}/dump.jsonl",
+                 "-b", "100", "-w", "4"],
+        "unit": "messages", "count_field": "written",
+    },
+    "dump-messages-sqlite": {
+        "argv": ["dump-messages", "-m", "{messages}", "-s", "1", "-o", "{tmp}/dump.sqlite",
+                 "-f", "sqlite", "-b", "100", "-w", "4"],
+        "unit": "messages", "count_field": "written",
+    },
+    "get-member": {
+        "argv": ["get-member", "-U", "{users}", "-w", "8", "--no-cache"],
+        "unit": "members", "prefix": "[MEMBER INFO]",
+    },
+    "add-members": {
+        "argv": ["add-members", "-U", "{users}", "-w", "8", "--report", "{tmp}/report.jsonl"],
+        "unit": "users", "prefix": "[SUCCESS]",
+    },
+    "listen-users": {
+        "argv": ["listen-users", "-d", "{seconds}", "--offset-file", "{tmp}/offset.json",
+                 "--poll-timeout", "1"],
+        "unit": "joins", "prefix": "[NEW USER]",
+    },
+    "get-admins": {"argv": ["get-admins"], "unit": "commands", "repeat": True},
+    "get-rights": {"argv": ["get-rights"], "unit": "commands", "repeat": True},
+}
+
+
+# -------------------------------------------------------------------
+# 1. Child process: run one scenario with the real CLI code
+# -------------------------------------------------------------------
+
+def run_child(spec: dict):
+    """
+    Runs spec["argv"] in this interpreter 'spec["repeat"]' times and prints
+    one JSON line with the measurements.
+    """
+    import telegram_tools_cli as cli
+
+    latencies = []
+    call = cli.BotApiClient.call
+
+    def timed_call(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return call(self, *args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    cli.BotApiClient.call = timed_call
+
+    items = 0
+
+    def sink(kind, data):
+        nonlocal items
+        if kind == "event":
+            if data.get("event") == "result" and spec.get("count_field"):
+                items += data.get(spec["count_field"], 0)
+        elif spec.get("prefix") and data.startswith(spec["prefix"]):
+            items += 1
+
+    status = 0
+    started = time.perf_counter()
+    for _ in range(spec["repeat"]):
+        status = cli.run_in_process(spec["argv"], sink)
+        if spec.get("count_runs") and status == 0:
+            items += 1
+    elapsed = time.perf_counter() - started
+
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    latencies.sort()
+    print(json.dumps({
+        "status": status,
+        "items": items,
+        "elapsed": elapsed,
+        "client_calls": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_rss_mb": peak_mb,
+    }))
+
+
+def percentile(values: list, p: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list (0.0 if empty).
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))]
+
+
+# -------------------------------------------------------------------
+# 2. Parent process: mock server, scenarios and report
+# -------------------------------------------------------------------
+
+def run_scenario(name: str, args, tmp: str, users_file: str) -> dict:
+    scenario = SCENARIOS[name]
+    api = MockBotApi(port=0, latency=args.latency, jitter=args.jitter,
+                     rate_limit_every=args.rate_limit_every, retry_after=args.retry_after,
+                     gap_every=args.gap_every, gap_length=args.gap_length,
+                     join_rate=args.join_rate).start()
+    try:
+        values = {"tmp": tmp, "users": users_file, "messages": args.messages,
+                  "seconds": args.listen_seconds}
+        argv = [part.format(**values) for part in scenario["argv"]]
+        argv += ["-t", BENCH_TOKEN, "-c", str(api.chat_id), "--api-url", api.url]
+        if not args.respect_limits:
+            argv += ["--rate", "0", "--chat-rate", "0"]
+        spec = {"argv": argv, "repeat": args.repeat if scenario.get("repeat") else 1,
+                "count_runs": scenario.get("repeat", False),
+                "count_field": scenario.get("count_field"), "prefix": scenario.get("prefix")}
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", json.dumps(spec)],
+                              cwd=tmp, capture_output=True, text=True)
+        if proc.returncode != 0 or not proc.stdout.strip():
+            raise RuntimeError(proc.stderr.strip() or f"exit code {proc.returncode}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+    finally:
+        api.stop()
+    stats = api.snapshot()
+    result.update(scenario=name, unit=scenario["unit"],
+                  items_per_s=result["items"] / result["elapsed"] if result["elapsed"] else 0.0,
+                  server_requests=sum(stats["requests"].values()),
+                  rate_limited=stats["rate_limited"])
+    return result
+
+
+def print_report(results: list):
+    print(f"{'scenario':<22}{'items':>8} {'unit':<9}{'time s':>8}{'items/s':>10}"
+          f"{'requests':>10}{'429':>6}{'p50 ms':>9}{'p99 ms':>9}{'RSS MB':>8}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['scenario']:<22} [ERROR] {r['error']}")
+            continue
+        print(f"{r['scenario']:<22}{r['items']:>8} {r['unit']:<9}{r['elapsed']:>8.2f}"
+              f"{r['items_per_s']:>10.1f}{r['server_requests']:>10}{r['rate_limited']:>6}"
+              f"{r['p50_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['peak_rss_mb']:>8.1f}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Benchmark telegram_tools_cli.py against a local mock Bot API",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("-s", "--scenarios", nargs="+", choices=list(SCENARIOS),
+                        default=list(SCENARIOS), help="Scenarios to run (default: all)")
+    parser.add_argument("--messages", type=int, default=5000,
+                        help="Message IDs to dump in dump-messages scenarios (default: 5000)")
+    parser.add_argument("--users", type=int, default=1000,
+                        help="User IDs for get-member and add-members (default: 1000)")
+    parser.add_argument("--repeat", type=int, default=50,
+                        help="Runs of single-call commands (get-admins, get-rights) (default: 50)")
+    parser.add_argument("--listen-seconds", dest="listen_seconds", type=int, default=5,
+                        help="Duration of the listen-users scenario (default: 5)")
+    parser.add_argument("--join-rate", dest="join_rate", type=float, default=1000.0,
+                        help="New members per second the mock reports (default: 1000)")
+    parser.add_argument("--latency", type=float, default=20.0,
+                        help="Mock server latency per call in ms (default: 20)")
+    parser.add_argument("--jitter", type=float, default=10.0,
+                        help="Extra random latency per call, up to this many ms (default: 10)")
+    parser.add_argument("--rate-limit-every", dest="rate_limit_every", type=int, default=0,
+                        help="Answer every Nth request with 429 (default: 0 = never)")
+    parser.add_argument("--retry-after", dest="retry_after", type=float, default=1.0,
+                        help="retry_after of those 429 responses in seconds (default: 1)")
+    parser.add_argument("--gap-every", dest="gap_every", type=int, default=50,
+                        help="Deleted message IDs: id %% GAP_EVERY < GAP_LENGTH (default: 50)")
+    parser.add_argument("--gap-length", dest="gap_length", type=int, default=3,
+                        help="Deleted IDs per GAP_EVERY block (default: 3)")
+    parser.add_argument("--respect-limits", dest="respect_limits", action="store_true",
+                        help="Keep the CLI's default rate limits (by default they are\n"
+                             "disabled to measure raw throughput)")
+    parser.add_argument("--json", dest="json_file", default=None,
+                        help="Also write the results to this JSON file")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    if args.child:
+        run_child(json.loads(args.child))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="tgtools-bench-") as tmp:
+        users_file = os.path.join(tmp, "users.txt")
+        with open(users_file, "w", encoding="utf-8") as f:
+            f.writelines(f"{700_000 + i}\n" for i in range(args.users))
+        for name in args.scenarios:
+            print(f"[INFO] Running {name}...", file=sys.stderr)
+            try:
+                results.append(run_scenario(name, args, tmp, users_file))
+            except RuntimeError as e:
+                results.append({"scenario": name, "error": str(e)})
+            for leftover in os.listdir(tmp):
+                if leftover != "users.txt":
+                    os.remove(os.path.join(tmp, leftover))
+
+    print_report(results)
+    if args.json_file:
+        with open(args.json_file, "w", encoding="utf-8") as f:
+            json.dump({"settings": {k: v for k, v in vars(args).items() if k != "child"},
+                       "results": results}, f, indent=2)
+        print(f"[INFO] Results written to '{args.json_file}'.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
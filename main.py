@@ -1,21 +1,28 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import time
+STARTED = time.perf_counter()  # for the startup time report; before the heavy imports
+
 import sys
 import os
-import json
-import requests
+import sqlite3
+import threading
+from collections import deque
+import telegram_tools_cli as cli
 from PyQt5.QtCore import (
-    Qt, QSize, QProcess, QTimer, pyqtSlot, QRegExp
+    Qt, QSize, QTimer, pyqtSignal, QRegExp, QObject,
+    QRunnable, QThreadPool, QAbstractTableModel, QModelIndex, QSortFilterProxyModel,
+    QStandardPaths
 )
 from PyQt5.QtGui import (
-    QFont, QColor, QIcon, QPixmap, QStandardItemModel, QStandardItem, QRegExpValidator
+    QFont, QColor, QIcon, QPixmap, QRegExpValidator
 )
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QHBoxLayout, QVBoxLayout, QListWidget,
-    QListWidgetItem, QLabel, QLineEdit, QPushButton, QTextEdit,
+    QListWidgetItem, QLabel, QLineEdit, QPushButton, QPlainTextEdit,
     QStackedWidget, QFrame, QFileDialog, QProgressBar, QMessageBox,
-    QTableView, QHeaderView, QAbstractItemView
+    QTableView, QHeaderView, QAbstractItemView, QTabWidget, QTabBar, QSpinBox
 )
 
 # -------------------------------------------------------------------
@@ -98,7 +105,7 @@ def load_stylesheet(app):
     }
 
     /* Output console */
-    QTextEdit#Console {
+    QPlainTextEdit#Console {
         background-color: #21212B;
         border: 1px solid #33334D;
         border-radius: 4px;
@@ -107,25 +114,339 @@ def load_stylesheet(app):
         font-size: 12px;
         color: #00FF92;
     }
+
+    /* Console and job tabs */
+    QTabWidget::pane {
+        border: none;
+    }
+    QTabBar::tab {
+        background-color: #1E1E2E;
+        color: #BBBBBB;
+        padding: 4px 12px;
+        border-top-left-radius: 4px;
+        border-top-right-radius: 4px;
+    }
+    QTabBar::tab:selected {
+        background-color: #323248;
+        color: #FFFFFF;
+    }
+    QSpinBox {
+        background-color: #1E1E2E;
+        border: 1px solid #33334D;
+        border-radius: 4px;
+        color: #FFFFFF;
+    }
     """
     app.setStyleSheet(qss)
 
+# Decoded images, shared by every widget that shows them
+_pixmaps = {}
+
+
+def cached_pixmap(path, size=None):
+    """
+    Returns 'path' as a QPixmap, smooth-scaled to fit size x size if a size
+    is given. Each file is decoded once and each size scaled once, however
+    many forms show it.
+    """
+    key = (path, size)
+    if key not in _pixmaps:
+        if size is None:
+            _pixmaps[key] = QPixmap(path)
+        else:
+            _pixmaps[key] = cached_pixmap(path).scaled(size, size, Qt.KeepAspectRatio,
+                                                       Qt.SmoothTransformation)
+    return _pixmaps[key]
+
 # -------------------------------------------------------------------
 # 2. Main Window
 # -------------------------------------------------------------------
+class LogConsole(QPlainTextEdit):
+    """
+    Read-only output console that stays fast on long runs.
+
+    append() only queues the line; a timer adds everything queued since the
+    last tick in one edit. The document keeps the last 'max_lines' lines
+    (older ones are dropped, like a ring buffer), and lines arriving faster
+    than that between two ticks are dropped before they reach the widget.
+    With set_log_file() every line is also written, in full, to a file.
+    """
+
+    # Override with the TELEGRAM_TOOLS_CONSOLE_LINES environment variable
+    MAX_LINES = int(os.environ.get("TELEGRAM_TOOLS_CONSOLE_LINES", 5000))
+
+    def __init__(self, parent=None, max_lines=None, interval_ms=100):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.max_lines = max_lines or self.MAX_LINES
+        self.setMaximumBlockCount(self.max_lines)
+        self._pending = deque(maxlen=self.max_lines)
+        self._log_file = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.flush)
+        self._timer.start()
+
+    def append(self, text):
+        self._pending.append(text)
+        if self._log_file:
+            self._log_file.write(text + "\n")
+
+    def flush(self):
+        if not self._pending:
+            return
+        text = "\n".join(self._pending)
+        self._pending.clear()
+        # Follow the output only if the user has not scrolled up
+        bar = self.verticalScrollBar()
+        at_bottom = bar.value() == bar.maximum()
+        self.appendPlainText(text)
+        if at_bottom:
+            bar.setValue(bar.maximum())
+        if self._log_file:
+            self._log_file.flush()
+
+    def clear(self):
+        self._pending.clear()
+        super().clear()
+
+    def set_log_file(self, path):
+        """
+        Starts copying every line to 'path' (appending), or stops with None.
+        """
+        if self._log_file:
+            self._log_file.close()
+        self._log_file = open(path, "a", encoding="utf-8", buffering=1 << 16) if path else None
+
+    @property
+    def log_path(self):
+        return self._log_file.name if self._log_file else None
+
+
+class TaskSignals(QObject):
+    done = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+
+class Task(QRunnable):
+    """
+    Runs fn(cancelled) on a QThreadPool thread and reports back through
+    signals, which Qt delivers on the GUI thread. 'cancelled' is a
+    threading.Event that fn may check between steps; once it is set no
+    signal is emitted, so a late result never reaches the UI.
+    fn must not touch widgets (QPixmap included); it returns plain data.
+    """
+
+    def __init__(self, fn):
+        super().__init__()
+        self.fn = fn
+        self.cancelled = threading.Event()
+        self.signals = TaskSignals()
+
+    def run(self):
+        try:
+            result = self.fn(self.cancelled)
+        except Exception as e:
+            if not self.cancelled.is_set():
+                self.signals.failed.emit(str(e))
+            return
+        if not self.cancelled.is_set():
+            self.signals.done.emit(result)
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class CommandSignals(QObject):
+    output = pyqtSignal(str, str)  # kind ("stdout" / "stderr"), line
+    event = pyqtSignal(object)
+    finished = pyqtSignal(int)
+
+
+class CommandRunner(QRunnable):
+    """
+    Runs one CLI command line in this process (cli.run_in_process) on a
+    QThreadPool thread, so modules, the rate governor and pooled
+    connections are reused between runs. Output arrives line by line and
+    events as dicts through signals; setting 'stop' ends the command the
+    way Ctrl+C does on the command line.
+    """
+
+    def __init__(self, argv):
+        super().__init__()
+        self.argv = argv
+        self.stop = threading.Event()
+        self.signals = CommandSignals()
+        self._partial = {}  # (kind, thread id) -> unfinished line
+        self._lock = threading.Lock()
+
+    def sink(self, kind, data):
+        if kind == "event":
+            self.signals.event.emit(data)
+            return
+        # Commands print from worker threads too; keep each thread's line apart
+        key = (kind, threading.get_ident())
+        with self._lock:
+            lines = (self._partial.pop(key, "") + data).split("\n")
+            if lines[-1]:
+                self._partial[key] = lines[-1]
+        for line in lines[:-1]:
+            self.signals.output.emit(kind, line)
+
+    def run(self):
+        status = cli.run_in_process(self.argv, self.sink, self.stop)
+        with self._lock:
+            rest, self._partial = list(self._partial.items()), {}
+        for (kind, _), line in rest:
+            self.signals.output.emit(kind, line)
+        self.signals.finished.emit(status)
+
+
+class JobPane(QWidget):
+    """
+    One command started from a form: its CommandRunner plus the job's own
+    console tab, status, progress bar and Stop button. 'state' goes from
+    "queued" to "running" and ends as "done", "stopped", "failed" or
+    "cancelled" (stopped while still queued).
+    """
+
+    def __init__(self, job_id, cmd, argv, parent=None):
+        super().__init__(parent)
+        self.job_id = job_id
+        self.cmd = cmd
+        self.runner = CommandRunner(argv)
+        self.state = "queued"
+        self.rate = 0.0  # msg/s from the latest progress event
+
+        self.status_label = QLabel("Queued")
+        self.progress = QProgressBar()
+        self.progress.setRange(0, 0)  # indeterminate until progress events arrive
+        self.progress.setHidden(True)
+        self.stop_btn = QPushButton("Stop")
+        self.stop_btn.setMaximumWidth(80)
+        self.console = LogConsole(self)
+        self.console.setObjectName("Console")
+
+        header = QHBoxLayout()
+        header.addWidget(self.status_label)
+        header.addWidget(self.progress, 1)
+        header.addWidget(self.stop_btn)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 4, 0, 0)
+        layout.addLayout(header)
+        layout.addWidget(self.console)
+
+    @property
+    def title(self):
+        return f"#{self.job_id} {self.cmd}"
+
+    @property
+    def active(self):
+        return self.state in ("queued", "running")
+
+
+class MessageTableModel(QAbstractTableModel):
+    """
+    Read-only (Msg ID, Date, Text) table for the Chat Preview.
+
+    Rows are produced by a loader, loader(last_row, count) -> list of rows
+    older than last_row (None for the first page), and handed to the view
+    page by page through canFetchMore()/fetchMore(): only rows the user
+    scrolls to are loaded and laid out, so large archives open instantly.
+    """
+
+    HEADERS = ("Msg ID", "Date", "Text")
+
+    def __init__(self, parent=None, page_size=500):
+        super().__init__(parent)
+        self.page_size = page_size
+        self._rows = []
+        self._shown = 0
+        self._loader = None
+        self._exhausted = True
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._shown
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return str(self._rows[index.row()][index.column()])
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def set_loader(self, loader):
+        self.beginResetModel()
+        self._rows = []
+        self._shown = 0
+        self._loader = loader
+        self._exhausted = loader is None
+        self.endResetModel()
+        self.fetchMore()
+
+    def set_rows(self, rows):
+        rows = list(rows)
+        self.set_loader(lambda last, count: rows if last is None else [])
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and (self._shown < len(self._rows) or not self._exhausted)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        if self._shown == len(self._rows) and not self._exhausted:
+            page = self._loader(self._rows[-1] if self._rows else None, self.page_size)
+            self._exhausted = len(page) < self.page_size
+            self._rows.extend(page)
+        count = min(self.page_size, len(self._rows) - self._shown)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._shown, self._shown + count - 1)
+        self._shown += count
+        self.endInsertRows()
+
+
 class MainWindow(QWidget):
+    # Commands running at once; override the default with the
+    # TELEGRAM_TOOLS_MAX_JOBS environment variable
+    MAX_JOBS = int(os.environ.get("TELEGRAM_TOOLS_MAX_JOBS", 3))
+    MAX_JOBS_LIMIT = 8
+
     def __init__(self):
         super().__init__()
         self.setObjectName("MainWindow")
         self.setWindowTitle("🚀 Telegram Tools GUI")
-        self.setWindowIcon(QIcon("logo.png"))  # Make sure “logo.png” is present
+        self.setWindowIcon(QIcon(cached_pixmap("logo.png", 64)))  # Make sure “logo.png” is present
         self.resize(1200, 700)
 
         # Store token and chat ID centrally
         self.bot_token = ""
         self.chat_id = ""
-        self.proc = None
-        self.stop_buttons = {}
+        # Commands run as jobs: at most max_jobs at a time, the rest wait
+        # in job_queue; every job keeps a tab until it is closed
+        self.jobs = []
+        self.job_queue = deque()
+        self.next_job_id = 1
+
+        # Network calls of the GUI itself run here, never on the event loop
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(4)
+        self.tasks = {}  # running Task -> description
+        # Downloaded media (bot avatar), kept between runs in the user's
+        # cache directory (e.g. ~/.cache/telegram-tools/files), not the CWD
+        cache_dir = QStandardPaths.writableLocation(QStandardPaths.CacheLocation)
+        self.file_cache = cli.FileCache(os.path.join(cache_dir, "files"))
+        # CLI commands run in-process on their own pool so that a long dump
+        # or listener never delays the GUI's own calls
+        self.command_pool = QThreadPool(self)
+        self.command_pool.setMaxThreadCount(self.MAX_JOBS_LIMIT)
 
         # Main layout: Sidebar + Vertical Splitter (forms / console)
         main_layout = QHBoxLayout(self)
@@ -161,7 +482,7 @@ class MainWindow(QWidget):
 
         # Console output at bottom
         console_frame = QFrame(self)
-        console_frame.setFixedHeight(200)
+        console_frame.setFixedHeight(240)
         console_frame.setObjectName("ConsoleFrame")
         console_layout = QVBoxLayout(console_frame)
         console_layout.setContentsMargins(8, 4, 8, 8)
@@ -171,18 +492,56 @@ class MainWindow(QWidget):
         clear_btn = QPushButton("Clear")
         clear_btn.setMaximumWidth(80)
         clear_btn.clicked.connect(self.clear_console)
+        # Copy the full output to a file (the console keeps the last lines only)
+        self.log_btn = QPushButton("Log to File…")
+        self.log_btn.setMaximumWidth(110)
+        self.log_btn.clicked.connect(self.toggle_log_file)
+
+        # Busy indicator for background network calls
+        self.busy_label = QLabel()
+        self.busy_bar = QProgressBar()
+        self.busy_bar.setRange(0, 0)  # indeterminate
+        self.busy_bar.setMaximumWidth(120)
+        self.busy_bar.setTextVisible(False)
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setMaximumWidth(80)
+        self.cancel_btn.clicked.connect(self.cancel_tasks)
+        for w in (self.busy_label, self.busy_bar, self.cancel_btn):
+            w.setHidden(True)
+
+        # Job summary and concurrency cap
+        self.jobs_label = QLabel()
+        self.max_jobs = QSpinBox()
+        self.max_jobs.setRange(1, self.MAX_JOBS_LIMIT)
+        self.max_jobs.setValue(min(self.MAX_JOBS, self.MAX_JOBS_LIMIT))
+        self.max_jobs.setPrefix("Max jobs: ")
+        self.max_jobs.valueChanged.connect(self.start_queued_jobs)
 
         # Layout for label and clear button
         header_h = QHBoxLayout()
         header_h.addWidget(console_label)
+        header_h.addSpacing(12)
+        header_h.addWidget(self.jobs_label)
         header_h.addStretch()
+        header_h.addWidget(self.busy_label)
+        header_h.addWidget(self.busy_bar)
+        header_h.addWidget(self.cancel_btn)
+        header_h.addWidget(self.max_jobs)
+        header_h.addWidget(self.log_btn)
         header_h.addWidget(clear_btn)
         console_layout.addLayout(header_h)
 
-        self.console = QTextEdit(console_frame)
+        # First tab: everything (job lines prefixed with their number);
+        # then one tab per job
+        self.console = LogConsole(console_frame)
         self.console.setObjectName("Console")
-        self.console.setReadOnly(True)
-        console_layout.addWidget(self.console)
+        self.console_tabs = QTabWidget(console_frame)
+        self.console_tabs.setTabsClosable(True)
+        self.console_tabs.tabCloseRequested.connect(self.close_job_tab)
+        self.console_tabs.addTab(self.console, "All")
+        self.console_tabs.tabBar().setTabButton(0, QTabBar.RightSide, None)
+        console_layout.addWidget(self.console_tabs)
+        self.update_jobs_label()
 
         # Container: vertical layout containing the stack + console
         container = QWidget(self)
@@ -192,20 +551,23 @@ class MainWindow(QWidget):
         container_layout.addWidget(console_frame)
         main_layout.addWidget(container, 4)
 
-        # Initialize forms for each command
+        # Forms are built the first time their tab is selected (see show_form);
+        # until then the stack holds an empty placeholder
+        self.commands = commands
         self.forms = {}
         for cmd in commands:
-            form = self.build_form(cmd)
-            self.forms[cmd] = form
-            self.stack.addWidget(form)
+            self.stack.addWidget(QWidget())
 
         # Connect sidebar selection to stack index
-        self.command_list.currentRowChanged.connect(self.stack.setCurrentIndex)
+        self.command_list.currentRowChanged.connect(self.show_form)
         self.command_list.setCurrentRow(0)
 
         # Validators
         self.int_validator = QRegExpValidator(QRegExp(r"\d+"))
 
+        # Open the Bot API connection in the background so the first click is fast
+        threading.Thread(target=cli.api_client.prewarm, daemon=True).start()
+
     # -------------------------------------------
     # 2.1. Build a dynamic form for each command
     # -------------------------------------------
@@ -218,8 +580,7 @@ class MainWindow(QWidget):
         # Title + optional logo on each form
         header_layout = QHBoxLayout()
         logo = QLabel()
-        pixmap = QPixmap("logo.png").scaled(32, 32, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        logo.setPixmap(pixmap)
+        logo.setPixmap(cached_pixmap("logo.png", 32))
         title = QLabel(f"<span style='font-size:18pt; font-weight:600;'>Telegram Tools – {cmd}</span>")
         header_layout.addWidget(logo)
         header_layout.addSpacing(8)
@@ -260,31 +621,49 @@ class MainWindow(QWidget):
             layout.addLayout(avatar_layout)
 
         elif cmd == "Chat Preview":
-            preview_btn = QPushButton("Fetch Last 20 Messages")
+            preview_btn = QPushButton("Fetch Recent Messages")
             preview_btn.clicked.connect(self.fetch_chat_preview)
+            archive_btn = QPushButton("Open SQLite Dump…")
+            archive_btn.clicked.connect(self.open_archive_preview)
+            buttons = QHBoxLayout()
+            buttons.addWidget(preview_btn)
+            buttons.addWidget(archive_btn)
             filter_label = QLabel("Filter (keyword):")
             self.filter_line = QLineEdit()
             self.filter_line.setPlaceholderText("Type to filter…")
-            self.filter_line.textChanged.connect(self.apply_filter)
+            # Re-filter once typing pauses rather than on every keystroke
+            self.filter_timer = QTimer(self)
+            self.filter_timer.setSingleShot(True)
+            self.filter_timer.setInterval(250)
+            self.filter_timer.timeout.connect(self.apply_filter)
+            self.filter_line.textChanged.connect(self.filter_timer.start)
 
             layout.addSpacing(12)
-            layout.addWidget(preview_btn)
+            layout.addLayout(buttons)
             layout.addWidget(filter_label)
             layout.addWidget(self.filter_line)
 
-            # Table view for messages
-            self.table_model = QStandardItemModel(0, 3, self)
-            self.table_model.setHorizontalHeaderLabels(["Msg ID", "Date", "Text"])
+            # Table view for messages; the proxy does the filtering
+            self.table_model = MessageTableModel(self)
+            self.filter_model = QSortFilterProxyModel(self)
+            self.filter_model.setSourceModel(self.table_model)
+            self.filter_model.setFilterKeyColumn(2)  # “Text” column
+            self.filter_model.setFilterCaseSensitivity(Qt.CaseInsensitive)
             self.table_view = QTableView()
-            self.table_view.setModel(self.table_model)
+            self.table_view.setModel(self.filter_model)
+            self.table_view.setWordWrap(False)
+            # Fixed row heights: the view never has to measure every row
+            self.table_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+            self.table_view.verticalHeader().setDefaultSectionSize(24)
             self.table_view.horizontalHeader().setStretchLastSection(True)
-            self.table_view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+            self.table_view.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
+            self.table_view.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
             self.table_view.setSelectionBehavior(QAbstractItemView.SelectRows)
             layout.addWidget(self.table_view)
 
         else:
             # All other commands: same as before
-            # Each will need a “Run” button, a Stop button (for dump-messages), a progress bar, etc.
+            # Each gets a “Run” button; progress and Stop live in the job's console tab
             if cmd == "add-members":
                 self.user_id_line = QLineEdit()
                 self.user_id_line.setPlaceholderText("User ID to add")
@@ -297,7 +676,7 @@ class MainWindow(QWidget):
 
             elif cmd == "listen-users":
                 self.duration_line = QLineEdit()
-                self.duration_line.setPlaceholderText("Duration (seconds, default 60)")
+                self.duration_line.setPlaceholderText("Duration (seconds, default 60, 0 = until stopped)")
                 self.duration_line.setValidator(self.int_validator)
                 layout.addWidget(QLabel("Duration:"))
                 layout.addWidget(self.duration_line)
@@ -323,7 +702,7 @@ class MainWindow(QWidget):
                 self.stop_id_line.setPlaceholderText("Stop Message ID (optional)")
                 self.stop_id_line.setValidator(self.int_validator)
                 self.output_file_line = QLineEdit()
-                self.output_file_line.setPlaceholderText("Output JSON file path")
+                self.output_file_line.setPlaceholderText("Output JSONL file path")
                 browse_btn = QPushButton("Browse...")
                 browse_btn.clicked.connect(lambda: self.browse_file(self.output_file_line))
                 layout.addWidget(QLabel("Start Message ID:"))
@@ -334,28 +713,26 @@ class MainWindow(QWidget):
                 layout.addWidget(self.output_file_line)
                 layout.addWidget(browse_btn)
 
-            # Add a progress bar for long commands
-            self.progress = QProgressBar()
-            self.progress.setValue(0)
-            self.progress.setHidden(True)
-            layout.addSpacing(10)
-            layout.addWidget(self.progress)
-
-            # Run and Stop buttons
+            # Run button: every click starts (or queues) a new job
             run_btn = QPushButton(f"Run {cmd}")
             run_btn.clicked.connect(lambda _, c=cmd: self.run_command(c))
+            layout.addSpacing(10)
             layout.addWidget(run_btn)
 
-            if cmd == "dump-messages":
-                stop_btn = QPushButton("Stop")
-                stop_btn.setEnabled(False)
-                stop_btn.clicked.connect(lambda _, c=cmd: self.stop_process(c))
-                layout.addWidget(stop_btn)
-                self.stop_buttons[cmd] = stop_btn
-
         layout.addStretch()
         return widget
 
+    def show_form(self, row):
+        cmd = self.commands[row]
+        if cmd not in self.forms:
+            form = self.build_form(cmd)
+            self.forms[cmd] = form
+            placeholder = self.stack.widget(row)
+            self.stack.insertWidget(row, form)
+            self.stack.removeWidget(placeholder)
+            placeholder.deleteLater()
+        self.stack.setCurrentIndex(row)
+
     # -------------------------------------------
     # 2.2. Synchronize token/chat across all forms
     # -------------------------------------------
@@ -384,7 +761,7 @@ class MainWindow(QWidget):
     # -------------------------------------------
     def browse_file(self, line_edit: QLineEdit):
         path, _ = QFileDialog.getSaveFileName(
-            self, "Select Output File", "", "JSON Files (*.json);;All Files (*)"
+            self, "Select Output File", "", "JSON Lines Files (*.jsonl);;JSON Files (*.json);;All Files (*)"
         )
         if path:
             line_edit.setText(path)
@@ -393,22 +770,53 @@ class MainWindow(QWidget):
     # 2.4. Clear console
     # -------------------------------------------
     def clear_console(self):
-        self.console.clear()
+        # Clears the tab being looked at
+        current = self.console_tabs.currentWidget()
+        (current.console if isinstance(current, JobPane) else self.console).clear()
+
+    def toggle_log_file(self):
+        if self.console.log_path:
+            self.console.append(f"[INFO] Stopped logging to '{self.console.log_path}'.")
+            self.console.set_log_file(None)
+            self.log_btn.setText("Log to File…")
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Log Console Output To", "telegram_tools.log", "Log Files (*.log);;All Files (*)"
+        )
+        if path:
+            self.console.set_log_file(path)
+            self.console.append(f"[INFO] Logging full output to '{path}'.")
+            self.log_btn.setText("Stop Logging")
 
     # -------------------------------------------
-    # 2.5. Stop process (like Ctrl+C)
+    # 2.5. Stop a job (like Ctrl+C)
     # -------------------------------------------
-    def stop_process(self, cmd):
-        if self.proc and self.proc.state() == QProcess.Running:
-            self.proc.kill()
-            self.console.append("[INFO] dump-messages stopped by user.")
-        stop_btn = self.stop_buttons.get(cmd)
-        if stop_btn:
-            stop_btn.setEnabled(False)
+    def stop_job(self, job):
+        if job.state == "queued":
+            self.job_queue.remove(job)
+            self.set_job_state(job, "cancelled")
+            self.log_job(job, "[INFO] Removed from the queue.")
+        elif job.state == "running" and not job.runner.stop.is_set():
+            job.runner.stop.set()
+            job.stop_btn.setEnabled(False)
+            job.status_label.setText("Stopping…")
+            self.log_job(job, "[INFO] Stop requested, finishing…")
+
+    def close_job_tab(self, index):
+        job = self.console_tabs.widget(index)
+        if not isinstance(job, JobPane):
+            return
+        if job.active:
+            # First close stops the job; the tab stays to show how it ended
+            self.stop_job(job)
+            return
+        self.console_tabs.removeTab(index)
+        self.jobs.remove(job)
+        job.deleteLater()
 
     # -------------------------------------------------------------------
     # 2.6. Asynchronous Execution & Progress Indicators
-    # Run selected command using QProcess; parse “dump-messages” progress
+    # Run selected command as a job; parse “dump-messages” progress events
     # -------------------------------------------------------------------
     def run_command(self, cmd):
         # Validate shared inputs
@@ -418,8 +826,8 @@ class MainWindow(QWidget):
             self.console.append("[ERROR] Bot Token and Chat ID are required.")
             return
 
-        # Build base command
-        base_cmd = ["python3", "telegram_tools_cli.py", cmd, "-t", token, "-c", chat]
+        # Build the command line; progress and results come back as events
+        base_cmd = [cmd, "-t", token, "-c", chat]
 
         # Add command-specific flags
         current_form = self.forms[cmd]
@@ -453,80 +861,98 @@ class MainWindow(QWidget):
             if stop_id:
                 base_cmd += ["-s", stop_id]
             base_cmd += ["-o", output_file]
-            # Show progress bar
-            self.progress = current_form.findChild(QProgressBar)
-            self.progress.setValue(0)
-            self.progress.setHidden(False)
-            # Enable Stop button
-            stop_btn = self.stop_buttons.get(cmd)
-            if stop_btn:
-                stop_btn.setEnabled(True)
-
-        # Echo command
-        self.console.append(f"[CMD] {' '.join(base_cmd).split('.py')[1].split('-t')[0]}")
-
-        # Launch with QProcess
-        self.proc = QProcess(self)
-        self.proc.setProgram(base_cmd[0])
-        self.proc.setArguments(base_cmd[1:])
-        self.proc.readyReadStandardOutput.connect(lambda: self.on_stdout(cmd))
-        self.proc.readyReadStandardError.connect(self.on_stderr)
-        self.proc.finished.connect(lambda exitCode, _: self.on_finished(cmd, exitCode))
-        self.proc.start()
-
-    @pyqtSlot()
-    def on_stdout(self, cmd):
-        data = self.proc.readAllStandardOutput().data().decode()
-        for raw_line in data.splitlines():
-            line = raw_line.strip()
-            # Attempt to pretty-print JSON
-            if line.startswith("{") or line.startswith("["):
-                try:
-                    parsed = json.loads(line)
-                    pretty = json.dumps(parsed, indent=2, ensure_ascii=False)
-                    self.console.append(pretty)
-                    continue
-                except Exception:
-                    pass
-            # Otherwise, display the raw line
-            self.console.append(line)
-
-            # If cmd == dump-messages, look for “Dump Message ID X” to update progress
-            if cmd == "dump-messages" and "Dump Message ID" in line:
-                try:
-                    parts = line.split()
-                    msg_id = int(parts[-1])
-                    form = self.forms[cmd]
-                    start_id = int(form.findChildren(QLineEdit)[2].text().strip())
-                    stop_id_text = form.findChildren(QLineEdit)[3].text().strip()
-                    stop_id = int(stop_id_text) if stop_id_text else 0
-                    total = start_id - stop_id + 1 if stop_id else start_id
-                    done = start_id - msg_id + 1
-                    percent = int(done / total * 100) if total > 0 else 0
-                    self.progress.setValue(min(max(percent, 0), 100))
-                except:
-                    pass
-
-    @pyqtSlot()
-    def on_stderr(self):
-        data = self.proc.readAllStandardError().data().decode()
-        for line in data.splitlines():
-            self.console.append(f"[ERR] {line}")
-
-    def on_finished(self, cmd, exitCode):
-        if cmd == "dump-messages":
-            self.progress.setValue(100)
-            # Disable Stop button
-            stop_btn = self.stop_buttons.get(cmd)
-            if stop_btn:
-                stop_btn.setEnabled(False)
+
+        # Each run is a job with its own tab; it starts now or once a slot frees up
+        job = JobPane(self.next_job_id, cmd, base_cmd)
+        self.next_job_id += 1
+        job.stop_btn.clicked.connect(lambda: self.stop_job(job))
+        job.runner.signals.output.connect(lambda kind, line: self.on_output(job, line))
+        job.runner.signals.event.connect(lambda event: self.on_event(job, event))
+        job.runner.signals.finished.connect(lambda status: self.on_finished(job, status))
+        self.jobs.append(job)
+        self.job_queue.append(job)
+        self.console_tabs.addTab(job, job.title)
+        # Echo command (without the token)
+        self.log_job(job, f"[CMD] {cmd} {' '.join(base_cmd[5:])}".rstrip())
+        self.start_queued_jobs()
+        if job.state == "queued":
+            self.set_job_state(job, "queued")
+            self.log_job(job, f"[INFO] Queued: {self.max_jobs.value()} jobs already running.")
+
+    def start_queued_jobs(self):
+        running = sum(1 for job in self.jobs if job.state == "running")
+        while self.job_queue and running < self.max_jobs.value():
+            job = self.job_queue.popleft()
+            self.set_job_state(job, "running")
+            self.command_pool.start(job.runner)
+            running += 1
+        self.update_jobs_label()
+
+    def set_job_state(self, job, state):
+        job.state = state
+        labels = {"queued": "Queued", "running": "Running", "done": "Done",
+                  "stopped": "Stopped", "failed": "Failed", "cancelled": "Cancelled"}
+        job.status_label.setText(labels[state])
+        job.stop_btn.setEnabled(job.active)
+        job.progress.setHidden(state != "running")
+        index = self.console_tabs.indexOf(job)
+        if index >= 0:
+            suffix = "" if state == "running" else f" ({labels[state].lower()})"
+            self.console_tabs.setTabText(index, job.title + suffix)
+
+    def log_job(self, job, line):
+        # In the job's own tab, and numbered in “All”
+        job.console.append(line)
+        self.console.append(f"[#{job.job_id}] {line}")
+
+    def update_jobs_label(self):
+        running = [job for job in self.jobs if job.state == "running"]
+        text = f"{len(running)} running, {len(self.job_queue)} queued"
+        rate = sum(job.rate for job in running)
+        if rate:
+            text += f" – {rate:.1f} msg/s"
+        self.jobs_label.setText(text)
+
+    def on_output(self, job, line):
+        # Human-readable output (already tagged [INFO], [WARN], ...)
+        if line.strip():
+            self.log_job(job, line.rstrip())
+
+    def on_event(self, job, event):
+        kind = event.get("event")
+        if kind == "progress" and job.cmd == "dump-messages":
+            job.progress.setRange(0, 100)
+            job.progress.setValue(int(event["fraction"] * 100))
+            eta = event.get("eta")
+            eta_text = f", ETA {int(eta) // 60}:{int(eta) % 60:02d}" if eta is not None else ""
+            job.progress.setFormat(f"%p% – {event['written']} written, "
+                                   f"{event['rate']:.1f} msg/s{eta_text}")
+            job.rate = event["rate"]
+            self.update_jobs_label()
+        elif kind == "error":
+            details = ", ".join(f"{k}={v}" for k, v in event.items()
+                                if k not in ("event", "time", "kind"))
+            self.log_job(job, f"[EVENT] {event.get('kind', 'error')} error: {details}")
+        elif kind == "result" and job.cmd == "dump-messages":
+            self.log_job(
+                job,
+                f"[RESULT] {event['written']} written, {event['failed']} not found, "
+                f"{event['network_errors']} network errors, {event['skipped']} skipped "
+                f"in {event['elapsed']:.1f}s"
+            )
+
+    def on_finished(self, job, exitCode):
+        job.rate = 0.0
         if exitCode != 0:
-            self.console.append(f"[ERROR] '{cmd}' exited with code {exitCode}")
+            self.set_job_state(job, "failed")
+            self.log_job(job, f"[ERROR] '{job.cmd}' exited with code {exitCode}")
+        elif job.runner.stop.is_set():
+            self.set_job_state(job, "stopped")
+            self.log_job(job, f"[INFO] '{job.cmd}' stopped by user.")
         else:
-            self.console.append(f"[INFO] '{cmd}' completed successfully.")
-        # Hide progress bar after a short delay
-        if cmd == "dump-messages":
-            QTimer.singleShot(1500, lambda: self.progress.setHidden(True))
+            self.set_job_state(job, "done")
+            self.log_job(job, f"[INFO] '{job.cmd}' completed successfully.")
+        self.start_queued_jobs()
 
     # -------------------------------------------------------------------
     # 2.7. Integrated Bot Configuration Panel
@@ -539,41 +965,42 @@ class MainWindow(QWidget):
             QMessageBox.warning(self, "Input Error", "Please enter a Bot Token.")
             return
         self.console.append("[INFO] Testing Bot Token…")
-        url = f"https://api.telegram.org/bot{token}/getMe"
-        try:
-            resp = requests.get(url, timeout=5)
-            data = resp.json()
+
+        def load(cancelled):
+            # Runs on the thread pool: plain data only, no widgets
+            data = cli.api_client.call(token, "getMe").json()
             if not data.get("ok"):
-                QMessageBox.critical(self, "Token Invalid", f"Error: {data.get('description', 'Unknown')}")
-                self.console.append(f"[ERROR] Token test failed: {data.get('description')}")
-                return
+                return {"error": data.get("description", "Unknown")}
             result = data["result"]
-            bot_name = result.get("username", "<unknown>")
-            form.findChild(QLabel, None).setText(f"<b>Bot:</b> @{bot_name}")
-            # Fetch avatar (if exists)
-            user_id = result.get("id")
-            photos_url = f"https://api.telegram.org/bot{token}/getUserProfilePhotos?user_id={user_id}&limit=1"
-            p_resp = requests.get(photos_url)
-            p_data = p_resp.json()
-            if p_data.get("ok") and p_data["result"]["total_count"] > 0:
-                # get file_id of first photo
-                file_id = p_data["result"]["photos"][0][-1]["file_id"]
-                af_resp = requests.get(f"https://api.telegram.org/bot{token}/getFile?file_id={file_id}")
-                af_data = af_resp.json()
-                file_path = af_data["result"]["file_path"]
-                file_url = f"https://api.telegram.org/file/bot{token}/{file_path}"
-                pic_data = requests.get(file_url).content
+            info = {"username": result.get("username", "<unknown>"), "photo": None}
+            # Fetch avatar (if exists); after the first test it comes from the file cache
+            if cancelled.is_set():
+                raise TaskCancelled()
+            info["photo"] = cli.fetch_profile_photo(token, result.get("id"), self.file_cache)
+            return info
+
+        def done(info):
+            if "error" in info:
+                QMessageBox.critical(self, "Token Invalid", f"Error: {info['error']}")
+                self.console.append(f"[ERROR] Token test failed: {info['error']}")
+                return
+            self.bot_info_label.setText(f"<b>Bot:</b> @{info['username']}")
+            if info["photo"]:
                 pixmap = QPixmap()
-                pixmap.loadFromData(pic_data)
-                form.findChild(QLabel).setPixmap(pixmap.scaled(80, 80, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-            self.console.append(f"[INFO] Bot @{bot_name} is valid.")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to reach Telegram API:\n{e}")
-            self.console.append(f"[ERROR] Exception during token test: {e}")
+                pixmap.loadFromData(info["photo"])
+                self.bot_avatar.setPixmap(pixmap.scaled(80, 80, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+            self.console.append(f"[INFO] Bot @{info['username']} is valid.")
+
+        def failed(error):
+            QMessageBox.critical(self, "Error", f"Failed to reach Telegram API:\n{error}")
+            self.console.append(f"[ERROR] Exception during token test: {error}")
+
+        self.run_async("Testing bot token…", load, done, failed)
 
     # -------------------------------------------------------------------
     # 2.8. Chat Preview & Message Filtering
-    # Fetch last 20 messages and populate table; apply filter on text
+    # Fetch recent updates (or page through a SQLite dump) into the table;
+    # filter on text through the proxy model
     # -------------------------------------------------------------------
     def fetch_chat_preview(self):
         form = self.forms["Chat Preview"]
@@ -582,41 +1009,115 @@ class MainWindow(QWidget):
         if not token or not chat:
             QMessageBox.warning(self, "Input Error", "Bot Token and Chat ID are required.")
             return
-        self.console.append("[INFO] Fetching last 20 messages…")
-        url = f"https://api.telegram.org/bot{token}/getUpdates?limit=20"
-        try:
-            resp = requests.get(url, timeout=5)
-            data = resp.json()
+        self.console.append("[INFO] Fetching recent messages…")
+
+        def load(cancelled):
+            # 100 is the most getUpdates returns; paging further with 'offset'
+            # would mark those updates as read for every other consumer
+            data = cli.api_client.call(token, "getUpdates", params={"limit": 100}).json()
             if not data.get("ok"):
-                QMessageBox.critical(self, "API Error", f"{data.get('description', 'Unknown error')}")
-                self.console.append(f"[ERROR] getUpdates failed: {data.get('description')}")
-                return
-            updates = data["result"]
-            self.table_model.removeRows(0, self.table_model.rowCount())
-            for upd in updates:
+                return {"error": data.get("description", "Unknown error")}
+            rows = []
+            for upd in data["result"]:
                 if "message" in upd:
                     msg = upd["message"]
-                    msg_id = msg.get("message_id", "")
-                    date = msg.get("date", "")
-                    text = msg.get("text", "") or msg.get("caption", "")
-                    items = [
-                        QStandardItem(str(msg_id)),
-                        QStandardItem(str(date)),
-                        QStandardItem(text)
-                    ]
-                    self.table_model.appendRow(items)
-            self.console.append("[INFO] Chat preview updated.")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to fetch updates:\n{e}")
-            self.console.append(f"[ERROR] Exception during preview: {e}")
+                    rows.append((msg.get("message_id", ""), msg.get("date", ""),
+                                 msg.get("text", "") or msg.get("caption", "")))
+            rows.reverse()  # newest first, like the dump preview
+            return {"rows": rows}
+
+        def done(result):
+            if "error" in result:
+                QMessageBox.critical(self, "API Error", result["error"])
+                self.console.append(f"[ERROR] getUpdates failed: {result['error']}")
+                return
+            self.table_model.set_rows(result["rows"])
+            self.console.append(f"[INFO] Chat preview updated ({len(result['rows'])} messages).")
+
+        def failed(error):
+            QMessageBox.critical(self, "Error", f"Failed to fetch updates:\n{error}")
+            self.console.append(f"[ERROR] Exception during preview: {error}")
+
+        self.run_async("Fetching messages…", load, done, failed)
+
+    def open_archive_preview(self):
+        form = self.forms["Chat Preview"]
+        chat = form.findChildren(QLineEdit)[1].text().strip()
+        if not chat:
+            QMessageBox.warning(self, "Input Error", "Chat ID is required.")
+            return
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Open Dump", "", "SQLite Dumps (*.sqlite *.db);;All Files (*)"
+        )
+        if not path:
+            return
+        try:
+            conn = sqlite3.connect(path)
+            total = conn.execute("SELECT COUNT(*) FROM messages WHERE chat_id = ?",
+                                 (int(chat),)).fetchone()[0]
+        except (sqlite3.Error, ValueError) as e:
+            QMessageBox.critical(self, "Error", f"Cannot read '{path}':\n{e}")
+            return
+
+        def load(last, count):
+            # Keyset paging: newest first, continuing below the last loaded ID
+            return conn.execute(
+                "SELECT message_id, date, text FROM messages WHERE chat_id = ? AND message_id < ? "
+                "ORDER BY message_id DESC LIMIT ?",
+                (int(chat), last[0] if last else 2 ** 63 - 1, count),
+            ).fetchall()
+
+        self.table_model.set_loader(load)
+        self.console.append(f"[INFO] Opened '{path}': {total} messages from chat {chat}.")
 
-    def apply_filter(self, text):
-        # Simple filter: hide rows not containing text in the “Text” column
-        for row in range(self.table_model.rowCount()):
-            index = self.table_model.index(row, 2)  # “Text” column
-            cell_text = self.table_model.data(index)
-            should_show = True if text.lower() in cell_text.lower() else False
-            self.table_view.setRowHidden(row, not should_show)
+    def apply_filter(self):
+        self.filter_model.setFilterFixedString(self.filter_line.text())
+
+    # -------------------------------------------------------------------
+    # 2.9. Background tasks
+    # Run network calls on the thread pool, with a busy indicator and Cancel
+    # -------------------------------------------------------------------
+    def run_async(self, description, fn, on_done, on_failed):
+        task = Task(fn)
+        task.signals.done.connect(lambda result: self.finish_task(task, on_done, result))
+        task.signals.failed.connect(lambda error: self.finish_task(task, on_failed, error))
+        self.tasks[task] = description
+        self.update_busy()
+        self.pool.start(task)
+
+    def finish_task(self, task, callback, value):
+        if self.tasks.pop(task, None) is None:
+            return  # cancelled meanwhile
+        self.update_busy()
+        callback(value)
+
+    def cancel_tasks(self):
+        for task in self.tasks:
+            task.cancelled.set()
+        if self.tasks:
+            self.console.append(f"[INFO] Cancelled: {', '.join(self.tasks.values())}")
+        self.tasks.clear()
+        self.update_busy()
+
+    def update_busy(self):
+        busy = bool(self.tasks)
+        self.busy_label.setText(next(reversed(self.tasks.values())) if busy else "")
+        for w in (self.busy_label, self.busy_bar, self.cancel_btn):
+            w.setHidden(not busy)
+
+    def closeEvent(self, event):
+        self.cancel_tasks()
+        # Let running commands finish their files (a dump flushes and saves
+        # its checkpoint) before the interpreter goes away
+        for job in list(self.job_queue):
+            self.stop_job(job)
+        for job in self.jobs:
+            job.runner.stop.set()
+        self.command_pool.waitForDone(5000)
+        self.console.flush()
+        self.console.set_log_file(None)
+        self.file_cache.close()
+        super().closeEvent(event)
 
 # -------------------------------------------------------------------
 # 3. Application entry point
@@ -625,10 +1126,31 @@ def main():
     # Set High DPI scaling before creating QApplication
     QApplication.setAttribute(Qt.AA_EnableHighDpiScaling, True)
     app = QApplication(sys.argv)
+    # Names the per-user directories (QStandardPaths) of the application
+    app.setApplicationName("telegram-tools")
     load_stylesheet(app)
+    window_started = time.perf_counter()
     window = MainWindow()
     window.show()
+    # Measured once the first event loop pass has painted the window
+    QTimer.singleShot(0, lambda: report_startup(app, window, window_started))
     sys.exit(app.exec_())
 
+
+def report_startup(app, window, window_started):
+    """
+    Logs how long startup took, split into imports and window creation.
+    With --startup-time the numbers go to stdout and the GUI exits at once,
+    so startup can be timed from a script to catch regressions.
+    """
+    now = time.perf_counter()
+    line = (f"[INFO] Started in {(now - STARTED) * 1000:.0f} ms "
+            f"(imports {(window_started - STARTED) * 1000:.0f} ms, "
+            f"window {(now - window_started) * 1000:.0f} ms)")
+    window.console.append(line)
+    if "--startup-time" in sys.argv[1:]:
+        print(line)
+        app.quit()
+
 if __name__ == "__main__":
     main()
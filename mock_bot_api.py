@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for the parts of the Telegram Bot API used by
+telegram_tools_cli.py, for benchmarks and offline testing.
+
+    python3 mock_bot_api.py --port 8081 --latency 40 --jitter 10 \
+        --rate-limit-every 500 --retry-after 1 --gap-every 100 --gap-length 5
+
+    python3 telegram_tools_cli.py dump-messages --api-url http://127.0.0.1:8081 \
+        -t 123456:TEST -c -1001234567890 -m 5000 -s 1 -o dump.jsonl
+
+Any token of the form <digits>:<text> is accepted. Chat messages 1 to
+--max-message-id exist, except the deleted ones described by --gap-every /
+--gap-length. getUpdates produces --join-rate "new member" updates per
+second for --chat-id. GET /stats returns the number of requests per method.
+"""
+
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+# 1x1 transparent PNG, served for every file download
+PNG_PIXEL = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000b49444154789c6360000200000500017a5eab3f0000000049454e44ae426082"
+)
+
+TOKEN_RE = re.compile(r"^bot(\d+):[\w-]+$")
+
+
+class BadRequest(Exception):
+    """
+    Raised by a method to answer 400 with the given description.
+    """
+
+
+# -------------------------------------------------------------------
+# 1. Simulated Bot API
+# -------------------------------------------------------------------
+
+class MockBotApi:
+    """
+    Threaded HTTP server answering Bot API calls from generated data.
+
+    'latency' (plus up to 'jitter') milliseconds are added to every call,
+    every 'rate_limit_every'-th call is refused with 429 and 'retry_after',
+    and message IDs with id % gap_every < gap_length count as deleted.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8081, latency: float = 0.0,
+                 jitter: float = 0.0, rate_limit_every: int = 0, retry_after: float = 1.0,
+                 gap_every: int = 0, gap_length: int = 1, max_message_id: int = 1_000_000,
+                 chat_id: int = -1001234567890, join_rate: float = 10.0):
+        self.latency = latency / 1000.0
+        self.jitter = jitter / 1000.0
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.gap_every = gap_every
+        self.gap_length = gap_length
+        self.max_message_id = max_message_id
+        self.chat_id = chat_id
+        self.join_rate = join_rate
+        self.started = time.monotonic()
+        self.opened = int(time.time())
+        self.invite_link = None
+        self._new_ids = itertools.count(10_000_000)
+        self._lock = threading.Lock()
+        self._calls = 0
+        self.stats = {"requests": {}, "rate_limited": 0}
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"requests": dict(self.stats["requests"]),
+                    "rate_limited": self.stats["rate_limited"]}
+
+    def exists(self, message_id: int) -> bool:
+        if not 1 <= message_id <= self.max_message_id:
+            return False
+        return not (self.gap_every and message_id % self.gap_every < self.gap_length)
+
+    def posted(self, message_id: int) -> int:
+        """
+        Original date of a message: one a minute, the last one posted at startup.
+        """
+        return self.opened - 60 * (self.max_message_id - message_id)
+
+    # --- request handling ---------------------------------------------------
+
+    def _handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are separate writes; without this, Nagle's
+            # algorithm and delayed ACKs add ~40 ms to every response
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, code: int, body: bytes, content_type: str = "application/json",
+                      headers: dict = None):
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _params(self) -> dict:
+                url = urlsplit(self.path)
+                params = dict(parse_qsl(url.query))
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                if body:
+                    if self.headers.get("Content-Type", "").startswith("application/json"):
+                        params.update(json.loads(body))
+                    else:
+                        params.update(parse_qsl(body.decode()))
+                return params
+
+            def do_HEAD(self):
+                # Connection pre-warming
+                self._send(302, b"")
+
+            def do_GET(self):
+                self._dispatch()
+
+            def do_POST(self):
+                self._dispatch()
+
+            def _dispatch(self):
+                parts = urlsplit(self.path).path.strip("/").split("/")
+                params = self._params()
+                if parts == ["stats"]:
+                    return self._send(200, json.dumps(api.snapshot()).encode())
+                is_file = parts[0] == "file"
+                if is_file:
+                    parts = parts[1:]
+                match = TOKEN_RE.match(parts[0]) if len(parts) >= 2 else None
+                if not match:
+                    return self._send(404, json.dumps(
+                        {"ok": False, "error_code": 404, "description": "Not Found"}).encode())
+                method = "file" if is_file else parts[1]
+                code, payload, headers = api.handle(method, params, int(match.group(1)))
+                if is_file and code == 200:
+                    return self._send(200, PNG_PIXEL, "image/png")
+                self._send(code, json.dumps(payload).encode(), headers=headers)
+
+        return Handler
+
+    def handle(self, method: str, params: dict, bot_id: int):
+        """
+        Returns (status, JSON payload, extra headers) for one call.
+        """
+        with self._lock:
+            self._calls += 1
+            self.stats["requests"][method] = self.stats["requests"].get(method, 0) + 1
+            limited = self.rate_limit_every and self._calls % self.rate_limit_every == 0
+            if limited:
+                self.stats["rate_limited"] += 1
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+        if limited:
+            return 429, {"ok": False, "error_code": 429,
+                         "description": f"Too Many Requests: retry after {self.retry_after:g}",
+                         "parameters": {"retry_after": self.retry_after}}, \
+                {"Retry-After": f"{self.retry_after:g}"}
+        handler = getattr(self, f"api_{method}", None)
+        if handler is None:
+            return 404, {"ok": False, "error_code": 404, "description": "Not Found"}, None
+        try:
+            result = handler(params, bot_id)
+        except BadRequest as e:
+            return 400, {"ok": False, "error_code": 400, "description": str(e)}, None
+        except (KeyError, ValueError, TypeError) as e:
+            return 400, {"ok": False, "error_code": 400, "description": f"Bad Request: {e}"}, None
+        return 200, {"ok": True, "result": result}, None
+
+    # --- methods -------------------------------------------------------------
+    # Each returns the 'result' value, or raises BadRequest
+
+    def _user(self, user_id: int, is_bot: bool = False) -> dict:
+        return {"id": user_id, "is_bot": is_bot, "first_name": f"User{user_id}",
+                "username": f"user{user_id}"}
+
+    def _chat(self, chat_id) -> dict:
+        return {"id": int(chat_id), "type": "supergroup", "title": "Mock chat"}
+
+    def api_getMe(self, params, bot_id):
+        return dict(self._user(bot_id, True), first_name="Mock Bot", username="mock_bot")
+
+    def api_forwardMessage(self, params, bot_id):
+        message_id = int(params["message_id"])
+        if not self.exists(message_id):
+            raise BadRequest("Bad Request: message to forward not found")
+        return {"message_id": next(self._new_ids), "date": int(time.time()),
+                "chat": self._chat(params["chat_id"]),
+                "forward_origin": {"type": "chat", "chat": self._chat(params["from_chat_id"]),
+                                   "message_id": message_id, "date": self.posted(message_id)},
+                "text": f"Message {message_id} from the mock Bot API"}
+
+    def api_forwardMessages(self, params, bot_id):
+        message_ids = params["message_ids"]
+        if isinstance(message_ids, str):
+            message_ids = json.loads(message_ids)
+        if not 1 <= len(message_ids) <= 100:
+            raise BadRequest("Bad Request: message_ids must contain 1-100 elements")
+        # Like Telegram, IDs that cannot be forwarded are skipped silently,
+        # unless none of them can
+        found = [i for i in message_ids if self.exists(int(i))]
+        if not found:
+            raise BadRequest("Bad Request: messages to forward not found")
+        return [{"message_id": next(self._new_ids)} for _ in found]
+
+    api_copyMessages = api_forwardMessages
+
+    def api_getUpdates(self, params, bot_id):
+        offset = int(params.get("offset", 0))
+        limit = min(int(params.get("limit", 100)), 100)
+        deadline = time.monotonic() + min(float(params.get("timeout", 0)), 50.0)
+        while True:
+            # Update N (from 1) is produced N / join_rate seconds after start
+            produced = int((time.monotonic() - self.started) * self.join_rate)
+            first = max(offset, 1)
+            if produced >= first or time.monotonic() >= deadline:
+                break
+            time.sleep(min(0.05, max(0.0, deadline - time.monotonic())))
+        updates = []
+        for update_id in range(first, min(produced, first + limit - 1) + 1):
+            user_id = 500_000 + update_id
+            updates.append({"update_id": update_id, "message": {
+                "message_id": update_id, "date": int(time.time()),
+                "chat": self._chat(self.chat_id), "from": self._user(user_id),
+                "new_chat_members": [self._user(user_id)]}})
+        return updates
+
+    def api_getChatMember(self, params, bot_id):
+        user_id = int(params["user_id"])
+        if user_id == bot_id:
+            return {"status": "administrator", "user": self._user(bot_id, True),
+                    "can_pin_messages": True, "can_invite_users": True,
+                    "can_delete_messages": True}
+        return {"status": "member", "user": self._user(user_id)}
+
+    def api_getChatAdministrators(self, params, bot_id):
+        return [{"status": "creator", "user": self._user(1000)},
+                {"status": "administrator", "user": self._user(1001)},
+                {"status": "administrator", "user": self._user(bot_id, True)}]
+
+    def api_getChat(self, params, bot_id):
+        chat = self._chat(params["chat_id"])
+        if self.invite_link:
+            chat["invite_link"] = self.invite_link
+        return chat
+
+    def api_exportChatInviteLink(self, params, bot_id):
+        self.invite_link = f"https://t.me/+mock{random.randrange(10 ** 8):08d}"
+        return self.invite_link
+
+    def api_inviteChatMember(self, params, bot_id):
+        int(params["user_id"])
+        return True
+
+    def api_getUserProfilePhotos(self, params, bot_id):
+        user_id = int(params["user_id"])
+        sizes = [{"file_id": f"photo{user_id}_{size}", "file_unique_id": f"AQAD{user_id}x{size}",
+                  "width": size, "height": size, "file_size": len(PNG_PIXEL)} for size in (160, 640)]
+        return {"total_count": 1, "photos": [sizes]}
+
+    def api_getFile(self, params, bot_id):
+        file_id = params["file_id"]
+        return {"file_id": file_id, "file_unique_id": f"AQAD{file_id}",
+                "file_size": len(PNG_PIXEL), "file_path": f"photos/{file_id}.png"}
+
+    def api_file(self, params, bot_id):
+        return True
+
+    def api_setWebhook(self, params, bot_id):
+        return True
+
+    def api_deleteWebhook(self, params, bot_id):
+        return True
+
+
+# -------------------------------------------------------------------
+# 2. Entry point
+# -------------------------------------------------------------------
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Local mock of the Telegram Bot API for benchmarks and offline tests",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8081, help="Port to listen on (default: 8081, 0 = any)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Milliseconds added to every call (default: 0)")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="Up to this many more milliseconds, at random (default: 0)")
+    parser.add_argument("--rate-limit-every", dest="rate_limit_every", type=int, default=0,
+                        help="Answer every Nth call with 429 Too Many Requests (default: 0 = never)")
+    parser.add_argument("--retry-after", dest="retry_after", type=float, default=1.0,
+                        help="retry_after sent with those 429 responses, in seconds (default: 1)")
+    parser.add_argument("--gap-every", dest="gap_every", type=int, default=0,
+                        help="Message IDs with id %% N < GAP_LENGTH are deleted (default: 0 = none)")
+    parser.add_argument("--gap-length", dest="gap_length", type=int, default=1,
+                        help="Deleted IDs at the start of every GAP_EVERY block (default: 1)")
+    parser.add_argument("--max-message-id", dest="max_message_id", type=int, default=1_000_000,
+                        help="Highest existing message ID (default: 1000000)")
+    parser.add_argument("--chat-id", dest="chat_id", type=int, default=-1001234567890,
+                        help="Chat the getUpdates joins happen in (default: -1001234567890)")
+    parser.add_argument("--join-rate", dest="join_rate", type=float, default=10.0,
+                        help="New members per second reported by getUpdates (default: 10)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    api = MockBotApi(**vars(args)).start()
+    print(f"[INFO] Mock Bot API listening on {api.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        api.stop()
+        print(f"[DONE] {json.dumps(api.snapshot())}")
+
+
+if __name__ == "__main__":
+    main()
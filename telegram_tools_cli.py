@@ -2,11 +2,26 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import bisect
+import contextlib
+import contextvars
 import sys
 import json
+import multiprocessing
+import os
+import queue
+import re
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 import time
 import signal
+import sqlite3
+import ssl
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 
 # -------------------------------------------------------------------
@@ -17,7 +32,12 @@ pre_parser.add_argument(
     "-hh", "--help-examples", action="store_true",
     help="Show complete examples for every command and exit"
 )
-pre_args, remaining_argv = pre_parser.parse_known_args()
+# Only honour -hh when run as a script, not when imported (e.g. by the GUI).
+# Only exact matches are passed in: argparse would otherwise take -h and
+# --help as abbreviations of -hh / --help-examples.
+pre_args, remaining_argv = pre_parser.parse_known_args(
+    [arg for arg in sys.argv[1:] if arg in ("-hh", "--help-examples")] if __name__ == "__main__" else []
+)
 
 if pre_args.help_examples:
     examples = """
@@ -25,21 +45,30 @@ Complete Examples for Each Command:
 
 1) add-members
    -----------------------
-   Generate an invite link and add a user to a chat.
-   - Required: BOT_TOKEN, CHAT_ID, USER_ID
+   Look up the chat's invite link and add one user (or a file of users) to a chat.
+   - Required: BOT_TOKEN, CHAT_ID, USER_ID or USERS_FILE
+   - Optional: WORKERS, REPORT (with USERS_FILE)
 
    Usage:
      python3 telegram_tools_cli.py add-members \\
        -t <BOT_TOKEN> \\
        -c <CHAT_ID> \\
-       -u <USER_ID>
+       -u <USER_ID> | -U <USERS_FILE> [-w <WORKERS>] [--report <REPORT_FILE>]
 
-   Example:
+   Examples:
      python3 telegram_tools_cli.py add-members \\
        -t 123456:ABC-DEF1234ghIkl-zyx57W2v1u123ew11 \\
        -c -1001122334455 \\
        -u 987654321
 
+     # One user ID per line ('-U -' reads stdin), 8 concurrent, JSONL report
+     python3 telegram_tools_cli.py add-members \\
+       -t 123456:ABC-DEF1234ghIkl-zyx57W2v1u123ew11 \\
+       -c -1001122334455 \\
+       -U cohort.txt \\
+       -w 8 \\
+       --report cohort_report.jsonl
+
 2) get-admins
    -----------------------
    List all administrators of a chat.
@@ -59,13 +88,16 @@ Complete Examples for Each Command:
    -----------------------
    Listen for new users joining a chat for a specified duration.
    - Required: BOT_TOKEN, CHAT_ID
-   - Optional: DURATION (seconds, default 60)
+   - Optional: DURATION (seconds, default 60; 0 = until Ctrl+C), OFFSET_FILE, POLL_TIMEOUT,
+               webhook mode: WEBHOOK_URL, LISTEN_HOST/PORT, CERT/KEY, WEBHOOK_SECRET
 
    Usage:
      python3 telegram_tools_cli.py listen-users \\
        -t <BOT_TOKEN> \\
        -c <CHAT_ID> \\
-       [-d <DURATION>]
+       [-d <DURATION>] \\
+       [--offset-file <PATH>] \\
+       [--poll-timeout <SECONDS>]
 
    Examples:
      # Default duration (60 seconds)
@@ -79,6 +111,28 @@ Complete Examples for Each Command:
        -c -1001122334455 \\
        -d 120
 
+     # Run continuously; the last update ID is saved between runs, so
+     # restarting picks up exactly where the previous run stopped
+     python3 telegram_tools_cli.py listen-users \\
+       -t 123456:ABC-DEF1234ghIkl-zyx57W2v1u123ew11 \\
+       -c -1001122334455 \\
+       -d 0
+
+     # Webhook mode: Telegram pushes updates to a local HTTPS receiver
+     python3 telegram_tools_cli.py listen-users \\
+       -t 123456:ABC-DEF1234ghIkl-zyx57W2v1u123ew11 \\
+       -c -1001122334455 \\
+       -d 0 \\
+       --webhook-url https://203.0.113.10:8443/ \\
+       --cert webhook.pem --key webhook.key \\
+       --webhook-secret change-me
+
+     # Local receiver only (no setWebhook), for POSTing test updates
+     python3 telegram_tools_cli.py listen-users \\
+       -t 123456:ABC-DEF1234ghIkl-zyx57W2v1u123ew11 \\
+       -c -1001122334455 \\
+       --no-register --listen-host 127.0.0.1 --listen-port 8080
+
 4) get-invite
    -----------------------
    Generate and display an invite link for a chat.
@@ -96,21 +150,34 @@ Complete Examples for Each Command:
 
 5) get-member
    -----------------------
-   Fetch detailed information about a specific chat member.
-   - Required: BOT_TOKEN, CHAT_ID, USER_ID
+   Fetch detailed information about a chat member, or about every user of a list.
+   Bulk (-U) results are cached in a local SQLite file for --cache-ttl seconds;
+   a single -u lookup always asks Telegram.
+   - Required: BOT_TOKEN, CHAT_ID, USER_ID or USERS_FILE
+   - Optional: WORKERS, OUTPUT_FILE, CACHE_FILE, CACHE_TTL, --no-cache
 
    Usage:
      python3 telegram_tools_cli.py get-member \\
        -t <BOT_TOKEN> \\
        -c <CHAT_ID> \\
-       -u <USER_ID>
+       -u <USER_ID> | -U <USERS_FILE> [-w <WORKERS>] [-o <OUTPUT_FILE>] \\
+       [--cache-file <PATH>] [--cache-ttl <SECONDS>] [--no-cache]
 
-   Example:
+   Examples:
      python3 telegram_tools_cli.py get-member \\
        -t 123456:ABC-DEF1234ghIkl-zyx57W2v1u123ew11 \\
        -c -1001122334455 \\
        -u 987654321
 
+     # Bulk audit; members looked up in the last 6 hours come from the cache
+     python3 telegram_tools_cli.py get-member \\
+       -t 123456:ABC-DEF1234ghIkl-zyx57W2v1u123ew11 \\
+       -c -1001122334455 \\
+       -U watchlist.txt \\
+       -w 8 \\
+       -o members.jsonl \\
+       --cache-ttl 21600
+
 6) get-rights
    -----------------------
    Show the bot's permissions in a chat.
@@ -130,7 +197,7 @@ Complete Examples for Each Command:
    -----------------------
    Forward and save messages from a starting ID down to a stop ID (or until max iterations).
    - Required: BOT_TOKEN, CHAT_ID, START_MESSAGE_ID, OUTPUT_FILE
-   - Optional: STOP_MESSAGE_ID, MAX_ITERATIONS
+   - Optional: STOP_MESSAGE_ID, MAX_ITERATIONS, WORKERS
 
    Usage:
      python3 telegram_tools_cli.py dump-messages \\
@@ -139,7 +206,12 @@ Complete Examples for Each Command:
        -m <START_MESSAGE_ID> \\
        -o <OUTPUT_FILE> \\
        [-s <STOP_MESSAGE_ID>] \\
-       [-n <MAX_ITERATIONS>]
+       [-n <MAX_ITERATIONS>] \\
+       [-w <WORKERS>] \\
+       [-f jsonl|json|sqlite] \\
+       [--resume] \\
+       [-b <BATCH_SIZE>] [--batch-method forward|copy] \\
+       [--skip-gaps <MISSES>] [--max-stride <IDS>]
 
    Examples:
      # Descending from 1010 down to 1, default max_iterations (16000)
@@ -148,7 +220,7 @@ Complete Examples for Each Command:
        -c -1001122334455 \\
        -m 1010 \\
        -s 1 \\
-       -o dump.json
+       -o dump.jsonl
 
      # Descending from 2000 down to 1500, max 600 iterations
      python3 telegram_tools_cli.py dump-messages \\
@@ -156,7 +228,7 @@ Complete Examples for Each Command:
        -c -1001122334455 \\
        -m 2000 \\
        -s 1500 \\
-       -o partial_dump.json \\
+       -o partial_dump.jsonl \\
        -n 600
 
      # Without a stop ID (will run until max_iterations or Ctrl+C)
@@ -164,49 +236,1077 @@ Complete Examples for Each Command:
        -t 123456:ABC-DEF1234ghIkl-zyx57W2v1u123ew11 \\
        -c -1001122334455 \\
        -m 5000 \\
-       -o unlimited_dump.json \\
+       -o unlimited_dump.jsonl \\
        -n 10000
 
-     # Press Ctrl+C at any time to save progress to the specified output file.
+     # 8 concurrent requests in flight, output still ordered by message ID
+     python3 telegram_tools_cli.py dump-messages \\
+       -t 123456:ABC-DEF1234ghIkl-zyx57W2v1u123ew11 \\
+       -c -1001122334455 \\
+       -m 1010 \\
+       -s 1 \\
+       -o dump.jsonl \\
+       -w 8
+
+     # 100 IDs per forwardMessages call (records hold source/new IDs only)
+     python3 telegram_tools_cli.py dump-messages \\
+       -t 123456:ABC-DEF1234ghIkl-zyx57W2v1u123ew11 \\
+       -c -1001122334455 \\
+       -m 1010 \\
+       -s 1 \\
+       -o ids.jsonl \\
+       -b 100
+
+     # Three bots sharing the work (each keeps its own rate limit)
+     python3 telegram_tools_cli.py dump-messages \\
+       -t 123456:ABC-DEF1234ghIkl-zyx57W2v1u123ew11 \\
+       -t 234567:BCD-EFG2345hiJkl-abc68X3w2v234fx22 \\
+       -t 345678:CDE-FGH3456ijKlm-bcd79Y4x3w345gy33 \\
+       -c -1001122334455 \\
+       -m 1010 \\
+       -s 1 \\
+       -o dump.jsonl \\
+       -w 12
+
+     # Chat with large deleted ranges: jump over them after 20 misses in a row
+     python3 telegram_tools_cli.py dump-messages \\
+       -t 123456:ABC-DEF1234ghIkl-zyx57W2v1u123ew11 \\
+       -c -1001122334455 \\
+       -m 50000 \\
+       -s 1 \\
+       -o sparse_dump.jsonl \\
+       --skip-gaps 20
+
+     # Messages are streamed to the output file (one JSON object per line);
+     # add "-f json" to write a JSON array instead.
+     # Press Ctrl+C at any time to stop; everything forwarded so far is kept.
+     # Re-run the same command with --resume to pick up where it stopped.
+
+8) run-jobs
+   -----------------------
+   Run several dump-messages jobs from a job file, a few at a time, each in its own process.
+   - Required: JOB_FILE (JSON array or JSON Lines; '-' for stdin)
+   - Optional: BOT_TOKEN (default for jobs without "token"), PARALLEL, WORKERS, --resume
+
+   Usage:
+     python3 telegram_tools_cli.py run-jobs \\
+       -j <JOB_FILE> \\
+       [-t <BOT_TOKEN>] \\
+       [-p <PARALLEL>] \\
+       [-w <WORKERS>] \\
+       [--resume]
+
+   Example:
+     # jobs.jsonl:
+     #   {"chat": -1001122334455, "start": 1010, "stop": 1, "output": "group_a.jsonl"}
+     #   {"chat": -1002233445566, "start": 50000, "output": "group_b.jsonl", "skip_gaps": 20}
+     python3 telegram_tools_cli.py run-jobs \\
+       -t 123456:ABC-DEF1234ghIkl-zyx57W2v1u123ew11 \\
+       -j jobs.jsonl \\
+       -p 3
+
+     # Each job logs to <output>.log; a progress line per job is printed every
+     # few seconds and a summary at the end.
+
+9) search
+   -----------------------
+   Full-text search in a dump written with "dump-messages -f sqlite".
+   - Required: DATABASE, QUERY (FTS5 syntax: words, "phrases", prefix*, AND/OR/NOT)
+   - Optional: CHAT_ID, LIMIT, --json
+
+   Usage:
+     python3 telegram_tools_cli.py search \\
+       -d <DATABASE> \\
+       -q <QUERY> \\
+       [-c <CHAT_ID>] [-n <LIMIT>] [--json]
+
+   Examples:
+     # Dump into a SQLite archive (several chats can share one database)
+     python3 telegram_tools_cli.py dump-messages \\
+       -t 123456:ABC-DEF1234ghIkl-zyx57W2v1u123ew11 \\
+       -c -1001122334455 \\
+       -m 50000 \\
+       -s 1 \\
+       -o archive.sqlite \\
+       -f sqlite
+
+     python3 telegram_tools_cli.py search -d archive.sqlite -q 'invoice NOT paid'
+     python3 telegram_tools_cli.py search -d archive.sqlite -q '"wire transfer"' \\
+       -c -1001122334455 -n 100 --json
 """
     print(examples.strip())
     sys.exit(0)
 
 
 # -------------------------------------------------------------------
-# 1. Functions extracted/refactored from individual scripts
+# 1. Rate-limited access to the Bot API
 # -------------------------------------------------------------------
 
-def generate_and_add_user(bot_token: str, chat_id: int, user_id: int):
+API_BASE_URL = "https://api.telegram.org"
+
+# Methods that post a message into 'chat_id' and so also count against
+# Telegram's per-chat limit, on top of the bot-wide one.
+CHAT_SEND_METHODS = {
+    "sendMessage", "forwardMessage", "forwardMessages", "copyMessage", "copyMessages",
+}
+
+# Telegram's documented per-chat limits, in messages per minute. A dump
+# forwards into the chat it reads, so these cap it too, whatever --workers is
+DEFAULT_GROUP_CHAT_RATE = 20.0
+DEFAULT_PRIVATE_CHAT_RATE = 60.0
+
+# Give up on a single call after this many consecutive 429 responses
+MAX_RATE_LIMIT_RETRIES = 10
+
+
+class TokenBucket:
     """
-    Generates an invite link for the chat, then adds the specified user.
+    Classic token bucket. reserve() books the next token and returns how long
+    the caller must wait before using it, so concurrent callers queue up
+    fairly instead of racing each other.
     """
-    # 1. Generate the invite link
-    url_invite = f"https://api.telegram.org/bot{bot_token}/exportChatInviteLink?chat_id={chat_id}"
-    resp = requests.get(url_invite)
-    if not resp.ok:
-        print(f"[ERROR] Failed to generate invite link: {resp.text}", file=sys.stderr)
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def wait_time(self) -> float:
+        """
+        How long a reserve() made now would have to wait, without reserving.
+        """
+        tokens = min(self.capacity, self.tokens + (time.monotonic() - self.updated) * self.rate)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+
+# (bot_rate, group_chat_rate, private_chat_rate) of the current run, set by
+# use_api_settings(); None = the governor's own rates
+rate_limits = contextvars.ContextVar("rate_limits", default=None)
+
+
+class RateGovernor:
+    """
+    Shared throttle for every Bot API call made by this process.
+
+    Keeps one token bucket per bot token (bot-wide limit) and one per
+    (bot token, chat) for message-sending methods. When Telegram answers 429,
+    pause() blocks every caller using that token for exactly 'retry_after'
+    seconds, so all workers back off together. Rates come from rate_limits
+    when a run sets them, so concurrent in-process runs keep their own.
+    """
+
+    def __init__(self, bot_rate: float = 30.0, group_chat_rate: float = DEFAULT_GROUP_CHAT_RATE,
+                 private_chat_rate: float = DEFAULT_PRIVATE_CHAT_RATE):
+        # bot_rate is per second, chat rates are per minute (as Telegram documents them)
+        self.bot_rate = bot_rate
+        self.group_chat_rate = group_chat_rate
+        self.private_chat_rate = private_chat_rate
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._paused_until = {}
+        self._rotation = 0
+
+    def _bucket(self, key, per_second: float, capacity: float = None) -> TokenBucket:
+        # Runs with different rates for the same bot or chat get separate buckets
+        key = (key, per_second)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if capacity is None:
+                capacity = max(1.0, per_second)
+            bucket = self._buckets[key] = TokenBucket(per_second, capacity)
+        return bucket
+
+    def _buckets_for(self, bot_token: str, chat_id=None) -> list:
+        buckets = []
+        bot_rate = self.rates()[0]
+        if bot_rate > 0:
+            buckets.append(self._bucket(bot_token, bot_rate))
+        if chat_id is not None:
+            per_minute = self.chat_rate(chat_id)
+            if per_minute > 0:
+                # Allow a one-minute burst, as Telegram does; a new chat starts full
+                buckets.append(self._bucket((bot_token, str(chat_id)), per_minute / 60.0, per_minute))
+        return buckets
+
+    def rates(self) -> tuple:
+        """
+        (bot_rate, group_chat_rate, private_chat_rate) of the current run.
+        """
+        return rate_limits.get() or (self.bot_rate, self.group_chat_rate, self.private_chat_rate)
+
+    def chat_rate(self, chat_id) -> float:
+        """
+        Messages per minute allowed into chat_id (0 = unlimited).
+        """
+        _, group_chat_rate, private_chat_rate = self.rates()
+        return group_chat_rate if int(chat_id) < 0 else private_chat_rate
+
+    def acquire(self, bot_token: str, chat_id=None):
+        """
+        Blocks until a request for bot_token (and chat_id, if given) may be sent.
+        """
+        with self._lock:
+            delay = max([bucket.reserve() for bucket in self._buckets_for(bot_token, chat_id)],
+                        default=0.0)
+        if delay > 0:
+            with trace_span("sleep: rate limit", "sleep", chat_id=chat_id):
+                time.sleep(delay)
+
+        # Honour any pause set by a 429 while we were waiting for a token
+        while True:
+            with self._lock:
+                wait = self._paused_until.get(bot_token, 0.0) - time.monotonic()
+            if wait <= 0:
+                return
+            with trace_span("sleep: 429 pause", "sleep"):
+                time.sleep(wait)
+
+    def pick_token(self, bot_tokens: list, chat_id=None) -> str:
+        """
+        Returns the token of bot_tokens that could send a request soonest,
+        rotating between tokens that are equally available.
+        """
+        if len(bot_tokens) == 1:
+            return bot_tokens[0]
+        with self._lock:
+            now = time.monotonic()
+            self._rotation = (self._rotation + 1) % len(bot_tokens)
+            candidates = bot_tokens[self._rotation:] + bot_tokens[:self._rotation]
+
+            def wait_time(bot_token):
+                paused = self._paused_until.get(bot_token, 0.0) - now
+                buckets = self._buckets_for(bot_token, chat_id)
+                return max([paused] + [bucket.wait_time() for bucket in buckets])
+
+            return min(candidates, key=wait_time)
+
+    def pause(self, bot_token: str, seconds: float):
+        """
+        Suspends every request for bot_token for 'seconds' (Telegram's retry_after).
+        """
+        with self._lock:
+            until = time.monotonic() + seconds
+            self._paused_until[bot_token] = max(self._paused_until.get(bot_token, 0.0), until)
+
+
+# Single governor shared by all functions (and worker threads) of this process
+rate_governor = RateGovernor()
+
+# print() writes the text and the newline separately; worker threads go
+# through locked_print() so their lines never interleave
+_print_lock = threading.Lock()
+
+
+def locked_print(*args, **kwargs):
+    with _print_lock:
+        print(*args, **kwargs)
+
+
+# Where --progress-json events go (None = disabled)
+event_stream = None
+
+# In-process runs (see run_in_process): where this context's output goes,
+# as sink(kind, data) with kind "stdout", "stderr" or "event", and the
+# threading.Event that asks the running command to stop
+output_sink = contextvars.ContextVar("output_sink", default=None)
+stop_request = contextvars.ContextVar("stop_request", default=None)
+
+
+class RoutedStream:
+    """
+    Stand-in for sys.stdout / sys.stderr that passes writes to the sink of
+    the current context, or to the original stream outside in-process runs.
+    """
+
+    def __init__(self, stream, kind: str):
+        self.stream = stream
+        self.kind = kind
+
+    def write(self, text):
+        sink = output_sink.get()
+        if sink is None:
+            return self.stream.write(text)
+        sink(self.kind, text)
+        return len(text)
+
+    def flush(self):
+        if output_sink.get() is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def stop_requested() -> bool:
+    """
+    True once the caller of an in-process run asked the command to stop.
+    Long-running loops check it alongside Ctrl+C handling.
+    """
+    event = stop_request.get()
+    return event is not None and event.is_set()
+
+
+def submit_in_context(pool, fn, *args):
+    """
+    pool.submit() that runs 'fn' in a copy of the caller's context, so that
+    output routing and stop requests follow the work to pool threads.
+    """
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+
+def enable_events():
+    """
+    Turns on --progress-json: stdout is reserved for events (one JSON
+    object per line) and all human-readable output moves to stderr.
+    """
+    global event_stream
+    event_stream = sys.stdout
+    sys.stdout = sys.stderr
+
+
+def emit_event(event: str, **fields):
+    """
+    Writes one machine-readable event, {"event": ..., "time": ..., **fields},
+    to event_stream, or to the sink of an in-process run (run_in_process).
+    Does nothing otherwise unless enable_events() was called.
+    """
+    sink = output_sink.get()
+    if sink is not None:
+        sink("event", dict(event=event, time=round(time.time(), 3), **fields))
+        return
+    if event_stream is None:
+        return
+    line = json.dumps(dict(event=event, time=round(time.time(), 3), **fields), ensure_ascii=False)
+    with _print_lock:
+        event_stream.write(line + "\n")
+        event_stream.flush()
+
+
+def retry_after_seconds(response) -> float:
+    """
+    Returns how long Telegram asked us to wait in a 429 response.
+    """
+    try:
+        return float(response.json()["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        pass
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return 15.0
+
+
+# Upper bounds (seconds) of the --metrics latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class ApiMetrics:
+    """
+    Per-method Bot API statistics for --metrics: requests, HTTP and network
+    errors, 429 responses, time spent waiting in the rate governor
+    ("throttled"), bytes sent and received, and a latency histogram.
+
+    record() is called by BotApiClient for every HTTP request (retries
+    included) from any thread. snapshot() / merge() move the raw counters
+    between processes (run-jobs workers); summary() is the JSON report and
+    write_textfile() the Prometheus one.
+    """
+
+    def __init__(self, command: str = None):
+        self.command = command
+        self.started = time.monotonic()
+        self.methods = {}
+        self._lock = threading.Lock()
+        self._textfile_path = None
+        self._textfile_stop = None
+        self._textfile_thread = None
+
+    def _entry(self, method: str) -> dict:
+        entry = self.methods.get(method)
+        if entry is None:
+            entry = self.methods[method] = {
+                "requests": 0, "errors": 0, "network_errors": 0, "rate_limited": 0,
+                "throttled_seconds": 0.0, "bytes_sent": 0, "bytes_received": 0,
+                "latency_sum": 0.0, "latency_max": 0.0,
+                "buckets": [0] * (len(LATENCY_BUCKETS) + 1),  # last one: +Inf
+            }
+        return entry
+
+    def record(self, method: str, response, latency: float, throttled: float = 0.0):
+        """
+        Records one request; 'response' is None when it failed at network level.
+        """
+        sent = received = 0
+        if response is not None:
+            body = response.request.body or b""
+            sent = len(body.encode() if isinstance(body, str) else body)
+            received = len(response.content)
+        with self._lock:
+            entry = self._entry(method)
+            entry["requests"] += 1
+            if response is None:
+                entry["network_errors"] += 1
+            elif response.status_code == 429:
+                entry["rate_limited"] += 1
+            elif not response.ok:
+                entry["errors"] += 1
+            entry["throttled_seconds"] += throttled
+            entry["bytes_sent"] += sent
+            entry["bytes_received"] += received
+            entry["latency_sum"] += latency
+            entry["latency_max"] = max(entry["latency_max"], latency)
+            entry["buckets"][bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {method: dict(entry, buckets=list(entry["buckets"]))
+                    for method, entry in self.methods.items()}
+
+    def merge(self, snapshot: dict):
+        with self._lock:
+            for method, other in snapshot.items():
+                entry = self._entry(method)
+                for key, value in other.items():
+                    if key == "buckets":
+                        entry["buckets"] = [a + b for a, b in zip(entry["buckets"], value)]
+                    elif key == "latency_max":
+                        entry["latency_max"] = max(entry["latency_max"], value)
+                    else:
+                        entry[key] += value
+
+    @staticmethod
+    def quantile(buckets: list, q: float, latency_max: float) -> float:
+        """
+        Estimates a latency quantile from histogram counts, interpolating
+        within the bucket like Prometheus' histogram_quantile().
+        """
+        total = sum(buckets)
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(buckets):
+            if count and seen + count >= rank:
+                lower = LATENCY_BUCKETS[i - 1] if i else 0.0
+                upper = LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else latency_max
+                return min(lower + (upper - lower) * (rank - seen) / count, latency_max)
+            seen += count
+        return latency_max
+
+    def summary(self) -> dict:
+        """
+        JSON-ready report: elapsed time, per-method statistics and totals.
+        """
+        methods = {}
+        totals = dict.fromkeys(("requests", "errors", "network_errors", "rate_limited",
+                                "bytes_sent", "bytes_received"), 0)
+        totals["throttled_seconds"] = 0.0
+        for method, entry in sorted(self.snapshot().items()):
+            buckets = entry.pop("buckets")
+            latency_sum = entry.pop("latency_sum")
+            latency_max = entry.pop("latency_max")
+            for key in totals:
+                totals[key] += entry[key]
+            cumulative = 0
+            histogram = {}
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), buckets):
+                cumulative += count
+                histogram[str(bound)] = cumulative
+            entry["throttled_seconds"] = round(entry["throttled_seconds"], 3)
+            entry["latency"] = {
+                "mean": round(latency_sum / entry["requests"], 4) if entry["requests"] else 0.0,
+                "p50": round(self.quantile(buckets, 0.50, latency_max), 4),
+                "p90": round(self.quantile(buckets, 0.90, latency_max), 4),
+                "p99": round(self.quantile(buckets, 0.99, latency_max), 4),
+                "max": round(latency_max, 4),
+                "histogram": histogram,
+            }
+            methods[method] = entry
+        totals["throttled_seconds"] = round(totals["throttled_seconds"], 3)
+        return {"command": self.command, "elapsed": round(time.monotonic() - self.started, 3),
+                "methods": methods, "totals": totals}
+
+    def write_textfile(self, path: str):
+        """
+        Writes the counters in Prometheus text format, atomically (for the
+        node_exporter textfile collector).
+        """
+        command = self.command or ""
+        counters = (
+            ("requests", "requests_total", "Bot API requests, retries included"),
+            ("errors", "errors_total", "Bot API responses with an HTTP error other than 429"),
+            ("network_errors", "network_errors_total", "Bot API requests that failed to complete"),
+            ("rate_limited", "rate_limited_total", "429 Too Many Requests responses"),
+            ("throttled_seconds", "throttled_seconds_total",
+             "Seconds spent waiting for the rate governor or a 429 pause"),
+            ("bytes_sent", "sent_bytes_total", "Request body bytes sent"),
+            ("bytes_received", "received_bytes_total", "Response body bytes received"),
+        )
+        snapshot = self.snapshot()
+        lines = []
+        for key, name, help_text in counters:
+            lines.append(f"# HELP telegram_tools_api_{name} {help_text}.")
+            lines.append(f"# TYPE telegram_tools_api_{name} counter")
+            for method, entry in sorted(snapshot.items()):
+                lines.append(f'telegram_tools_api_{name}{{command="{command}",method="{method}"}} '
+                             f'{entry[key]}')
+        name = "telegram_tools_api_request_duration_seconds"
+        lines.append(f"# HELP {name} Bot API request latency.")
+        lines.append(f"# TYPE {name} histogram")
+        for method, entry in sorted(snapshot.items()):
+            labels = f'command="{command}",method="{method}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), entry["buckets"]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {entry['latency_sum']:.6f}")
+            lines.append(f"{name}_count{{{labels}}} {entry['requests']}")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+    def start_textfile(self, path: str, interval: float = 15.0):
+        """
+        Rewrites the Prometheus textfile every 'interval' seconds until
+        stop_textfile(), which writes it one last time.
+        """
+        self._textfile_stop = threading.Event()
+
+        def loop():
+            while not self._textfile_stop.wait(interval):
+                try:
+                    self.write_textfile(path)
+                except OSError as e:
+                    locked_print(f"[WARN] Cannot write metrics to '{path}': {e}", file=sys.stderr)
+
+        self._textfile_path = path
+        self._textfile_thread = threading.Thread(target=loop, daemon=True)
+        self._textfile_thread.start()
+
+    def stop_textfile(self):
+        if self._textfile_thread is None:
+            return
+        self._textfile_stop.set()
+        self._textfile_thread.join()
+        self._textfile_thread = None
+        self.write_textfile(self._textfile_path)
+
+
+# Statistics of the current run when --metrics is on (per in-process run)
+api_metrics = contextvars.ContextVar("api_metrics", default=None)
+
+
+class TraceWriter:
+    """
+    Timeline of a run for --trace, in Chrome trace event format: a JSON
+    array of complete ("X") events, viewable in Perfetto (ui.perfetto.dev),
+    chrome://tracing or speedscope.
+
+    Spans are written as they end, so memory use stays flat on long runs and
+    a killed run still leaves a readable file (the closing bracket is
+    optional in this format). Safe to use from any thread.
+    """
+
+    def __init__(self, path: str, process_name: str = "telegram-tools"):
+        self.path = path
+        self.process_name = process_name
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.spans = 0
+        self._threads = set()
+        self._lock = threading.Lock()
+        self.file = open(path, "w", encoding="utf-8", buffering=1 << 16)
+        self.file.write("[\n")
+
+    def _event(self, event: dict):
+        self.file.write(json.dumps(event, ensure_ascii=False, default=str) + ",\n")
+
+    def span(self, name: str, category: str, start: float, end: float, args: dict = None):
+        """
+        Records a span between two time.perf_counter() readings.
+        """
+        thread = threading.current_thread()
+        event = {"name": name, "cat": category, "ph": "X", "pid": self.pid, "tid": thread.ident,
+                 "ts": round((start - self.origin) * 1e6, 1),
+                 "dur": round((end - start) * 1e6, 1)}
+        if args:
+            event["args"] = args
+        with self._lock:
+            if thread.ident not in self._threads:
+                self._threads.add(thread.ident)
+                self._event({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": thread.ident,
+                             "args": {"name": thread.name}})
+            self._event(event)
+            self.spans += 1
+
+    def close(self):
+        with self._lock:
+            self.file.write(json.dumps({"name": "process_name", "ph": "M", "pid": self.pid,
+                                        "args": {"name": self.process_name}}) + "\n]\n")
+            self.file.close()
+
+
+# Timeline of the current run when --trace is on (per in-process run)
+trace_writer = contextvars.ContextVar("trace_writer", default=None)
+
+
+@contextlib.contextmanager
+def trace_span(name: str, category: str, **args):
+    """
+    Records the enclosed block as a --trace span (a no-op without --trace).
+    Yields the span's 'args' dict, so the block can add results to it.
+    """
+    writer = trace_writer.get()
+    if writer is None:
+        yield args
         return
-    invite_link = resp.json().get("result")
-    print(f"[INVITE LINK GENERATED] {invite_link}")
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        writer.span(name, category, start, time.perf_counter(), args)
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for --profile. A background thread records
+    the stack of every other thread each 'interval' seconds; threads waiting
+    on the network or sleeping are sampled too, so the profile shows where
+    the run's time goes rather than only its CPU use.
+
+    write() saves the samples in "collapsed stacks" format (one
+    "thread;outer;...;inner count" line per distinct stack), which
+    speedscope and flame graph tools read directly.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = {}
+        self.started = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:"
+                                 f"{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                key = ";".join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.monotonic() - self.started
+
+    def write(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+
+    def top(self, count: int = 10) -> list:
+        """
+        Returns [(function, samples)] for the innermost frames seen most often.
+        """
+        leaves = {}
+        for stack, samples in self.samples.items():
+            leaf = stack.rsplit(";", 1)[-1]
+            leaves[leaf] = leaves.get(leaf, 0) + samples
+        return sorted(leaves.items(), key=lambda item: -item[1])[:count]
+
+
+class TracedConnectMixin:
+    """
+    Reports urllib3 connection setup as --trace spans: "dns+tcp connect"
+    (name resolution and TCP handshake) and, for HTTPS, "tls connect",
+    which contains it; the TLS handshake is the difference.
+    """
+
+    def _new_conn(self):
+        with trace_span("dns+tcp connect", "network", host=self.host, port=self.port):
+            return super()._new_conn()
+
+
+class TracedHTTPConnection(TracedConnectMixin, HTTPConnection):
+    pass
+
+
+class TracedHTTPSConnection(TracedConnectMixin, HTTPSConnection):
+    def connect(self):
+        with trace_span("tls connect", "network", host=self.host, port=self.port):
+            super().connect()
+
+
+class TracedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TracedHTTPConnection
+
+
+class TracedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TracedHTTPSConnection
+
+
+class TracedHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose new connections are reported to --trace.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": TracedHTTPConnectionPool,
+                                                   "https": TracedHTTPSConnectionPool}
+
+
+class BotApiClient:
+    """
+    Reusable Bot API client shared by the CLI and the GUI.
 
-    # 2. Add the user to the chat
-    url_add = f"https://api.telegram.org/bot{bot_token}/inviteChatMember"
+    Wraps a requests.Session whose connection pool keeps TLS connections to
+    api.telegram.org alive between calls, applies (connect, read) timeouts to
+    every request and sends each call through the rate governor.
+    """
+
+    def __init__(self, base_url: str = API_BASE_URL, connect_timeout: float = 10.0,
+                 read_timeout: float = 30.0, pool_size: int = 10, governor: RateGovernor = None):
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = pool_size
+        self.governor = governor if governor is not None else rate_governor
+        self.session = requests.Session()
+        adapter = TracedHTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    def call(self, bot_token: str, method: str, http_method: str = "GET", rate_chat=None,
+             **request_kwargs):
+        """
+        Performs a Bot API call through the rate governor and returns the response.
+
+        'rate_chat' is the chat the call posts into; it is only charged against the
+        per-chat limit for message-sending methods. 429 responses are retried in a
+        loop after pausing for the advertised retry_after; any other response
+        (or the last 429 once MAX_RATE_LIMIT_RETRIES is reached) is returned as is.
+        Extra keyword arguments (params, json, data, timeout, ...) go to requests.
+        """
+        url = f"{self.base_url}/bot{bot_token}/{method}"
+        chat = rate_chat if method in CHAT_SEND_METHODS else None
+        request_kwargs.setdefault("timeout", self.timeout)
+        metrics = api_metrics.get()
+        with trace_span(method, "api") as span:
+            for attempt in range(1, MAX_RATE_LIMIT_RETRIES + 1):
+                if metrics is None:
+                    self.governor.acquire(bot_token, chat)
+                    response = self._request(method, http_method, url, request_kwargs)
+                else:
+                    response = self._measured(metrics, method, bot_token, chat, http_method, url,
+                                              request_kwargs)
+                if response.status_code != 429 or attempt == MAX_RATE_LIMIT_RETRIES:
+                    span.update(status=response.status_code, attempts=attempt)
+                    return response
+                wait = retry_after_seconds(response)
+                locked_print(f"[WARN] Rate limit encountered (429) on {method}. "
+                             f"Pausing all requests for {wait:g} seconds...", file=sys.stderr)
+                emit_event("error", kind="rate_limit", method=method, retry_after=wait)
+                self.governor.pause(bot_token, wait)
+        return response
+
+    def _request(self, method: str, http_method: str, url: str, request_kwargs: dict):
+        """
+        The HTTP request of a call, as an "http" span under --trace.
+        """
+        with trace_span(f"HTTP {http_method} {method}", "http") as span:
+            response = self.session.request(http_method, url, **request_kwargs)
+            span.update(status=response.status_code, bytes=len(response.content))
+        return response
+
+    def _measured(self, metrics: ApiMetrics, method: str, bot_token: str, chat, http_method: str,
+                  url: str, request_kwargs: dict):
+        """
+        One governed request, recorded in 'metrics'.
+        """
+        waited = time.monotonic()
+        self.governor.acquire(bot_token, chat)
+        started = time.monotonic()
+        try:
+            response = self._request(method, http_method, url, request_kwargs)
+        except requests.exceptions.RequestException:
+            metrics.record(method, None, time.monotonic() - started, started - waited)
+            raise
+        metrics.record(method, response, time.monotonic() - started, started - waited)
+        return response
+
+    def download_file(self, bot_token: str, file_path: str):
+        """
+        Downloads a file previously resolved with getFile.
+        """
+        url = f"{self.base_url}/file/bot{bot_token}/{file_path}"
+        metrics = api_metrics.get()
+        started = time.monotonic()
+        with trace_span("HTTP GET file", "http") as span:
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except requests.exceptions.RequestException:
+                if metrics is not None:
+                    metrics.record("file", None, time.monotonic() - started)
+                raise
+            span.update(status=response.status_code, bytes=len(response.content))
+        if metrics is not None:
+            metrics.record("file", response, time.monotonic() - started)
+        return response
+
+    def prewarm(self, connections: int = 1):
+        """
+        Opens up to 'connections' keep-alive connections in parallel so the first
+        real calls skip the TCP and TLS handshakes. Failures are ignored; the
+        calls themselves will report them.
+        """
+        def touch():
+            try:
+                self.session.head(self.base_url, timeout=self.timeout, allow_redirects=False)
+            except requests.RequestException:
+                pass
+
+        threads = [threading.Thread(target=contextvars.copy_context().run, args=(touch,), daemon=True)
+                   for _ in range(max(1, min(connections, self.pool_size)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def close(self):
+        self.session.close()
+
+
+# Client shared by every run of this process, and the client of the current
+# run when its options differ (see use_api_settings)
+api_client = BotApiClient()
+current_client = contextvars.ContextVar("current_client", default=None)
+
+
+def get_api_client() -> BotApiClient:
+    """
+    Returns the client of the current run.
+    """
+    return current_client.get() or api_client
+
+
+@contextlib.contextmanager
+def use_api_settings(bot_rate: float, chat_rate: float or None, **options):
+    """
+    Applies a run's rates and client 'options' (see BotApiClient) to the
+    current context only, so other in-process runs keep theirs. The shared
+    client, and its open connections, is used if it already has these
+    settings and a connection pool at least as large; otherwise the run gets
+    its own client, closed when it ends. chat_rate None keeps the defaults.
+    """
+    group_chat_rate = rate_governor.group_chat_rate if chat_rate is None else chat_rate
+    private_chat_rate = rate_governor.private_chat_rate if chat_rate is None else chat_rate
+    limits_token = rate_limits.set((bot_rate, group_chat_rate, private_chat_rate))
+    client = BotApiClient(**options)
+    if (client.base_url, client.connect_timeout, client.read_timeout, client.governor) == \
+            (api_client.base_url, api_client.connect_timeout, api_client.read_timeout,
+             api_client.governor) and client.pool_size <= api_client.pool_size:
+        client.close()
+        client = api_client
+    client_token = current_client.set(client)
+    try:
+        yield client
+    finally:
+        current_client.reset(client_token)
+        rate_limits.reset(limits_token)
+        if client is not api_client:
+            client.close()
+
+
+def call_bot_api(bot_token: str, method: str, http_method: str = "GET", rate_chat=None,
+                 **request_kwargs):
+    """
+    Shortcut for get_api_client().call(); see BotApiClient.call().
+    """
+    return get_api_client().call(bot_token, method, http_method, rate_chat=rate_chat,
+                                 **request_kwargs)
+
+
+# -------------------------------------------------------------------
+# 2. Functions extracted/refactored from individual scripts
+# -------------------------------------------------------------------
+
+# Invite links already looked up in this process, by chat ID
+_invite_links = {}
+_invite_links_lock = threading.Lock()
+
+
+def chat_invite_link(bot_token: str, chat_id: int):
+    """
+    Returns the chat's primary invite link, or None on error.
+
+    The existing link is read with getChat and only generated with
+    exportChatInviteLink if the chat has none yet, since exporting revokes
+    the previous link. The result is cached for the rest of the process.
+    """
+    with _invite_links_lock:
+        if chat_id in _invite_links:
+            return _invite_links[chat_id]
+
+        resp = call_bot_api(bot_token, "getChat", params={"chat_id": chat_id})
+        invite_link = resp.json().get("result", {}).get("invite_link") if resp.ok else None
+        if not invite_link:
+            resp = call_bot_api(bot_token, "exportChatInviteLink", params={"chat_id": chat_id})
+            if not resp.ok:
+                print(f"[ERROR] Failed to generate invite link: {resp.text}", file=sys.stderr)
+                return None
+            invite_link = resp.json().get("result")
+            print(f"[INVITE LINK GENERATED] {invite_link}")
+        else:
+            print(f"[INVITE LINK] {invite_link}")
+        _invite_links[chat_id] = invite_link
+        return invite_link
+
+
+def add_user(bot_token: str, chat_id: int, user_id: int) -> dict:
+    """
+    Adds one user to the chat and returns a report record
+    ({"user_id", "ok", "error"}).
+    """
     params = {"chat_id": chat_id, "user_id": user_id}
-    resp_add = requests.post(url_add, data=params)
-    data_add = resp_add.json()
+    try:
+        resp_add = call_bot_api(bot_token, "inviteChatMember", "POST", data=params)
+        data_add = resp_add.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        data_add = {"ok": False, "description": str(e)}
     if data_add.get("ok"):
-        print(f"[SUCCESS] User {user_id} added to chat {chat_id}.")
-    else:
-        print(f"[ERROR] Could not add user {user_id}: {data_add}", file=sys.stderr)
+        locked_print(f"[SUCCESS] User {user_id} added to chat {chat_id}.")
+        return {"user_id": user_id, "ok": True, "error": None}
+    locked_print(f"[ERROR] Could not add user {user_id}: {data_add}", file=sys.stderr)
+    return {"user_id": user_id, "ok": False,
+            "error": data_add.get("description") or json.dumps(data_add)}
+
+
+def generate_and_add_user(bot_token: str, chat_id: int, user_id: int):
+    """
+    Looks up (or generates) the chat's invite link, then adds the specified user.
+    """
+    if chat_invite_link(bot_token, chat_id) is None:
+        return
+    add_user(bot_token, chat_id, user_id)
+
+
+def read_user_ids(path: str):
+    """
+    Yields the user IDs listed in 'path' ('-' for stdin), one per line.
+    Blank lines, '#' comments and repeated IDs are skipped; anything after
+    the first comma is ignored, so the first column of a CSV works too.
+    """
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    seen = set()
+    try:
+        for number, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].split(",", 1)[0].strip()
+            if not line:
+                continue
+            try:
+                user_id = int(line)
+            except ValueError:
+                print(f"[WARN] Line {number}: '{line}' is not a user ID, skipped.", file=sys.stderr)
+                continue
+            if user_id not in seen:
+                seen.add(user_id)
+                yield user_id
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def add_members_bulk(bot_token: str, chat_id: int, user_ids, workers: int = 4,
+                     report_file: str = None):
+    """
+    Adds every user of the 'user_ids' iterable to the chat with up to
+    'workers' requests in flight (all paced by the rate governor). The
+    invite link is looked up once for the whole run. One JSON line per user
+    ({"user_id", "ok", "error"}) is appended to 'report_file' if given.
+    Returns the number of users that could not be added.
+    """
+    if chat_invite_link(bot_token, chat_id) is None:
+        return None
+
+    report = open(report_file, "a", encoding="utf-8") if report_file else None
+    added = failed = 0
+    start_time = time.time()
+    pending = set()
+    executor = ThreadPoolExecutor(max_workers=max(1, workers))
+
+    def collect(done):
+        nonlocal added, failed
+        for future in done:
+            result = future.result()
+            if result["ok"]:
+                added += 1
+            else:
+                failed += 1
+            if report:
+                report.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    try:
+        for user_id in user_ids:
+            # Keep the queue short so huge (or endless stdin) lists stream through
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            if stop_requested():
+                break
+            pending.add(submit_in_context(executor, add_user, bot_token, chat_id, user_id))
+        done, pending = wait(pending)
+        collect(done)
+    except KeyboardInterrupt:
+        print("\n[INFO] Interrupted. Waiting for requests in flight...", file=sys.stderr)
+        # Queued users are dropped; those already being added are reported
+        running = [future for future in pending if not future.cancel()]
+        done, _ = wait(running)
+        collect(done)
+    finally:
+        executor.shutdown(wait=True)
+        if report:
+            report.close()
+
+    elapsed = time.time() - start_time
+    print(f"[DONE] {added} users added, {failed} failed in {elapsed:.1f}s"
+          + (f"; report in '{report_file}'." if report_file else "."))
+    return failed
 
 
 def list_chat_administrators(bot_token: str, chat_id: int):
     """
     Lists all administrators of a Telegram chat (group).
     """
-    url = f"https://api.telegram.org/bot{bot_token}/getChatAdministrators?chat_id={chat_id}"
-    resp = requests.get(url)
+    resp = call_bot_api(bot_token, "getChatAdministrators", params={"chat_id": chat_id})
     if not resp.ok:
         print(f"[ERROR] {resp.text}", file=sys.stderr)
         return
@@ -219,30 +1319,286 @@ def list_chat_administrators(bot_token: str, chat_id: int):
               f"(@{user.get('username','')}) – role: {status}")
 
 
-def listen_for_new_users(bot_token: str, chat_id: int, timeout: int = 60):
+# Update types listen-users needs; everything else is never sent by Telegram
+LISTEN_ALLOWED_UPDATES = ["message"]
+# Longest long-poll the Bot API accepts
+MAX_POLL_TIMEOUT = 50
+
+
+def offset_file_for(bot_token: str) -> str:
+    """
+    Default file storing the getUpdates offset of a bot (offsets are per bot).
+    """
+    return f".listen_offset_{bot_token.split(':', 1)[0]}.json"
+
+
+def load_update_offset(path: str) -> int:
+    """
+    Returns the getUpdates offset saved in 'path', or 0 if there is none.
     """
-    Listens to incoming updates for 'timeout' seconds and prints new users as they join.
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return int(json.load(f).get("offset", 0))
+    except FileNotFoundError:
+        return 0
+    except (ValueError, AttributeError) as e:
+        print(f"[WARN] Ignoring unreadable offset file '{path}': {e}", file=sys.stderr)
+        return 0
+
+
+def save_update_offset(path: str, offset: int):
+    """
+    Atomically writes the next getUpdates offset to 'path'.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"offset": offset, "updated": int(time.time())}, f)
+    os.replace(tmp_path, path)
+
+
+def handle_join_update(update: dict, chat_id: int):
     """
-    offset = 0
-    print(f"[INFO] Listening for new users in chat {chat_id} for {timeout} seconds...")
+    Prints the users who joined 'chat_id' in a single update (from getUpdates
+    or a webhook). Updates from other chats the bot is in are ignored.
+    """
+    msg = update.get("message")
+    if not msg or msg.get("chat", {}).get("id") != chat_id:
+        return
+    for new_user in msg.get("new_chat_members", []):
+        print(f"[NEW USER] ID: {new_user.get('id')} – "
+              f"{new_user.get('first_name')} {new_user.get('last_name')} "
+              f"(@{new_user.get('username','')})")
+
+
+def listen_for_new_users(bot_token: str, chat_id: int, timeout: int = 60,
+                         offset_file: str = None, poll_timeout: int = 30):
+    """
+    Listens to incoming updates for 'timeout' seconds (0 = until Ctrl+C) and
+    prints new users as they join 'chat_id'.
+
+    The getUpdates offset is saved to 'offset_file' (default: one file per
+    bot in the current directory) after every batch, so a later run carries
+    on where this one stopped instead of replaying confirmed updates. Only
+    'message' updates are requested, and each long poll waits up to
+    'poll_timeout' seconds for new updates.
+    """
+    offset_file = offset_file or offset_file_for(bot_token)
+    offset = load_update_offset(offset_file)
+    poll_timeout = max(1, min(poll_timeout, MAX_POLL_TIMEOUT))
+    if timeout:
+        print(f"[INFO] Listening for new users in chat {chat_id} for {timeout} seconds...")
+    else:
+        print(f"[INFO] Listening for new users in chat {chat_id} until Ctrl+C...")
+    if offset:
+        print(f"[INFO] Resuming from update {offset} (saved in '{offset_file}').")
     start_time = time.time()
 
-    while time.time() - start_time < timeout:
-        url = f"https://api.telegram.org/bot{bot_token}/getUpdates"
-        params = {"timeout": 10, "offset": offset}
-        resp = requests.get(url, params=params)
-        if not resp.ok:
-            print(f"[ERROR] getUpdates failed: {resp.text}", file=sys.stderr)
-            break
-        updates = resp.json().get("result", [])
-        for upd in updates:
-            offset = upd["update_id"] + 1
-            msg = upd.get("message", {})
-            new_members = msg.get("new_chat_members", [])
-            for new_user in new_members:
-                print(f"[NEW USER] ID: {new_user.get('id')} – "
-                      f"{new_user.get('first_name')} {new_user.get('last_name')} "
-                      f"(@{new_user.get('username','')})")
+    try:
+        while (not timeout or time.time() - start_time < timeout) and not stop_requested():
+            remaining = timeout - (time.time() - start_time) if timeout else poll_timeout
+            wait = max(1, min(poll_timeout, int(remaining)))
+            params = {
+                "timeout": wait,
+                "offset": offset,
+                "allowed_updates": json.dumps(LISTEN_ALLOWED_UPDATES),
+            }
+            # Long poll: the server may legitimately hold the request for 'wait' seconds
+            client = get_api_client()
+            resp = call_bot_api(bot_token, "getUpdates", params=params,
+                                timeout=(client.connect_timeout, client.read_timeout + wait))
+            if not resp.ok:
+                print(f"[ERROR] getUpdates failed: {resp.text}", file=sys.stderr)
+                break
+            updates = resp.json().get("result", [])
+            if not updates:
+                continue
+            for upd in updates:
+                handle_join_update(upd, chat_id)
+            offset = updates[-1]["update_id"] + 1
+            save_update_offset(offset_file, offset)
+    except KeyboardInterrupt:
+        print("\n[INFO] Interrupted.")
+    print("[INFO] Listening finished.")
+
+
+class WebhookReceiver:
+    """
+    Local HTTP(S) endpoint for Telegram webhook deliveries.
+
+    Requests are served by a thread each (ThreadingHTTPServer); a handler
+    only checks the secret token, decodes the body and puts the update on a
+    bounded queue, so the actual processing happens in the consumer at its
+    own pace. When the queue is full the delivery is refused with 503 and
+    Telegram retries it later. The secret is checked before the body is
+    read, and bodies without a valid Content-Length (400) or larger than
+    MAX_BODY (413) are refused unread.
+    """
+
+    # Far above any real update; Telegram caps messages at 4096 characters
+    MAX_BODY = 1024 * 1024
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 8443, secret: str = None,
+                 queue_size: int = 1000, certfile: str = None, keyfile: str = None):
+        self.secret = secret
+        self.updates = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+        self._thread = None
+
+    def _handler_class(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, code: int, close: bool = False):
+                self.send_response(code)
+                self.send_header("Content-Length", "0")
+                if close:
+                    # The body was not read, so the connection cannot be reused
+                    self.send_header("Connection", "close")
+                    self.close_connection = True
+                self.end_headers()
+
+            def do_POST(self):
+                if receiver.secret and \
+                        self.headers.get("X-Telegram-Bot-Api-Secret-Token") != receiver.secret:
+                    return self._reply(403, close=True)
+                try:
+                    length = int(self.headers.get("Content-Length", ""))
+                except ValueError:
+                    return self._reply(400, close=True)
+                if length < 0:
+                    return self._reply(400, close=True)
+                if length > receiver.MAX_BODY:
+                    return self._reply(413, close=True)
+                body = self.rfile.read(length)
+                try:
+                    update = json.loads(body)
+                except ValueError:
+                    return self._reply(400)
+                try:
+                    receiver.updates.put_nowait(update)
+                except queue.Full:
+                    receiver.dropped += 1
+                    return self._reply(503)
+                self._reply(200)
+
+        return Handler
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def get(self, timeout: float):
+        """
+        Returns the next update, or None if none arrived within 'timeout' seconds.
+        """
+        try:
+            return self.updates.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def api_ok(resp) -> bool:
+    """
+    True if 'resp' is a successful Bot API answer. An error page that is not
+    JSON (from a proxy, say) counts as a failure instead of raising.
+    """
+    try:
+        return resp.ok and bool(resp.json().get("ok"))
+    except ValueError:
+        return False
+
+
+def listen_via_webhook(bot_token: str, chat_id: int, url: str, timeout: int = 60,
+                       host: str = "0.0.0.0", port: int = 8443, secret: str = None,
+                       certfile: str = None, keyfile: str = None, register: bool = True,
+                       queue_size: int = 1000, max_connections: int = 40):
+    """
+    Like listen_for_new_users(), but Telegram pushes updates to a local
+    WebhookReceiver instead of being polled. The webhook is registered with
+    setWebhook (unless 'register' is False, e.g. when updates are POSTed by
+    a local test client) and removed again on exit, since getUpdates does
+    not work while a webhook is set.
+    """
+    receiver = WebhookReceiver(host, port, secret=secret, queue_size=queue_size,
+                               certfile=certfile, keyfile=keyfile)
+    receiver.start()
+    scheme = "https" if certfile else "http"
+    print(f"[INFO] Webhook receiver listening on {scheme}://{host}:{receiver.port}")
+
+    if register:
+        data = {
+            "url": url,
+            "allowed_updates": json.dumps(LISTEN_ALLOWED_UPDATES),
+            "max_connections": max_connections,
+        }
+        if secret:
+            data["secret_token"] = secret
+        files = None
+        if certfile:
+            # Lets Telegram trust a self-signed certificate
+            files = {"certificate": open(certfile, "rb")}
+        error = None
+        try:
+            resp = call_bot_api(bot_token, "setWebhook", http_method="POST", data=data, files=files)
+        except requests.exceptions.RequestException as e:
+            error = str(e)
+        finally:
+            if files:
+                files["certificate"].close()
+        if error is None and not api_ok(resp):
+            error = resp.text
+        if error is not None:
+            print(f"[ERROR] setWebhook failed: {error}", file=sys.stderr)
+            receiver.stop()
+            return
+        print(f"[OK] Webhook registered: {url}")
+
+    if timeout:
+        print(f"[INFO] Listening for new users in chat {chat_id} for {timeout} seconds...")
+    else:
+        print(f"[INFO] Listening for new users in chat {chat_id} until Ctrl+C...")
+    start_time = time.time()
+    try:
+        while (not timeout or time.time() - start_time < timeout) and not stop_requested():
+            update = receiver.get(1.0)
+            if update is not None:
+                handle_join_update(update, chat_id)
+    except KeyboardInterrupt:
+        print("\n[INFO] Interrupted.")
+    finally:
+        if register:
+            try:
+                resp = call_bot_api(bot_token, "deleteWebhook", http_method="POST")
+                error = None if api_ok(resp) else resp.text
+            except requests.exceptions.RequestException as e:
+                error = str(e)
+            if error is None:
+                print("[OK] Webhook removed.")
+            else:
+                print(f"[WARN] deleteWebhook failed: {error}", file=sys.stderr)
+        receiver.stop()
+    if receiver.dropped:
+        print(f"[WARN] {receiver.dropped} deliveries refused while the queue was full "
+              f"(Telegram retries them).", file=sys.stderr)
     print("[INFO] Listening finished.")
 
 
@@ -250,8 +1606,7 @@ def get_invite_link(bot_token: str, chat_id: int):
     """
     Generates and prints an invite link for the chat.
     """
-    url = f"https://api.telegram.org/bot{bot_token}/exportChatInviteLink?chat_id={chat_id}"
-    resp = requests.get(url)
+    resp = call_bot_api(bot_token, "exportChatInviteLink", params={"chat_id": chat_id})
     if not resp.ok:
         print(f"[ERROR] {resp.text}", file=sys.stderr)
         return
@@ -259,34 +1614,181 @@ def get_invite_link(bot_token: str, chat_id: int):
     print(f"[INVITE LINK] {link}")
 
 
-def get_chat_member_info(bot_token: str, chat_id: int, user_id: int):
+class MemberCache:
     """
-    Fetches and prints info about a specific chat member.
+    Persistent getChatMember cache in a SQLite file.
+
+    Each entry stores the raw ChatMember object and the time it was fetched;
+    entries older than 'ttl' seconds are treated as missing and refreshed.
+    The connection is shared between worker threads behind a lock, and
+    writes are committed in batches (and on close).
+    """
+
+    def __init__(self, path: str, ttl: float = 3600.0, commit_every: int = 100):
+        self.path = path
+        self.ttl = ttl
+        self.commit_every = commit_every
+        self._lock = threading.Lock()
+        self._uncommitted = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS members ("
+            " chat_id INTEGER NOT NULL,"
+            " user_id INTEGER NOT NULL,"
+            " data TEXT NOT NULL,"
+            " fetched REAL NOT NULL,"
+            " PRIMARY KEY (chat_id, user_id))"
+        )
+        self.conn.commit()
+
+    def get_many(self, chat_id: int, user_ids: list) -> dict:
+        """
+        Returns {user_id: ChatMember} for the fresh entries among 'user_ids'.
+        """
+        found = {}
+        oldest = time.time() - self.ttl
+        with self._lock:
+            # Stay below SQLite's limit on query parameters
+            for i in range(0, len(user_ids), 500):
+                chunk = user_ids[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT user_id, data FROM members WHERE chat_id = ? AND fetched >= ? "
+                    f"AND user_id IN ({','.join('?' * len(chunk))})",
+                    [chat_id, oldest] + chunk,
+                )
+                found.update((user_id, json.loads(data)) for user_id, data in rows)
+        return found
+
+    def put(self, chat_id: int, user_id: int, member: dict):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO members (chat_id, user_id, data, fetched) VALUES (?, ?, ?, ?)",
+                (chat_id, user_id, json.dumps(member, ensure_ascii=False), time.time()),
+            )
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_every:
+                self.conn.commit()
+                self._uncommitted = 0
+
+    def close(self):
+        with self._lock:
+            self.conn.commit()
+            self.conn.close()
+
+
+def fetch_chat_member(bot_token: str, chat_id: int, user_id: int):
+    """
+    Returns the ChatMember object of 'user_id', or None (after printing the
+    error) if Telegram refuses the lookup.
     """
-    url = f"https://api.telegram.org/bot{bot_token}/getChatMember"
     params = {"chat_id": chat_id, "user_id": user_id}
-    resp = requests.get(url, params=params)
+    try:
+        resp = call_bot_api(bot_token, "getChatMember", params=params)
+    except requests.exceptions.RequestException as e:
+        locked_print(f"[ERROR] getChatMember for {user_id} failed: {e}", file=sys.stderr)
+        return None
     if not resp.ok:
-        print(f"[ERROR] {resp.text}", file=sys.stderr)
-        return
-    info = resp.json().get("result", {})
+        locked_print(f"[ERROR] {resp.text}", file=sys.stderr)
+        return None
+    return resp.json().get("result", {})
+
+
+def print_member_info(info: dict, cached: bool = False):
     user = info.get("user", {})
     status = info.get("status")
-    print(f"[MEMBER INFO] ID: {user.get('id')} | "
-          f"First Name: {user.get('first_name')} | "
-          f"Last Name: {user.get('last_name')} | "
-          f"Username: @{user.get('username','')} | "
-          f"Status: {status}")
+    locked_print(f"[MEMBER INFO] ID: {user.get('id')} | "
+                 f"First Name: {user.get('first_name')} | "
+                 f"Last Name: {user.get('last_name')} | "
+                 f"Username: @{user.get('username','')} | "
+                 f"Status: {status}" + (" (cached)" if cached else ""))
+
+
+def get_chat_member_info(bot_token: str, chat_id: int, user_id: int, cache: MemberCache = None):
+    """
+    Fetches and prints info about a specific chat member, from 'cache' if
+    it holds a fresh entry.
+    """
+    info = cache.get_many(chat_id, [user_id]).get(user_id) if cache else None
+    if info is not None:
+        print_member_info(info, cached=True)
+        return
+    info = fetch_chat_member(bot_token, chat_id, user_id)
+    if info is None:
+        return
+    if cache:
+        cache.put(chat_id, user_id, info)
+    print_member_info(info)
+
+
+def get_members_bulk(bot_token: str, chat_id: int, user_ids, workers: int = 4,
+                     cache: MemberCache = None, output_file: str = None, chunk_size: int = 500):
+    """
+    Resolves every user of the 'user_ids' iterable, 'chunk_size' IDs at a
+    time: fresh cache entries are answered locally, the rest is fetched
+    with up to 'workers' concurrent getChatMember calls and stored in the
+    cache. Each result is printed and, if 'output_file' is given, appended
+    to it as a JSON line ({"user_id", "cached", "member"}).
+    Returns the number of users that could not be looked up.
+    """
+    output = open(output_file, "a", encoding="utf-8") if output_file else None
+    hits = fetched = failed = 0
+    start_time = time.time()
+    executor = ThreadPoolExecutor(max_workers=max(1, workers))
+
+    def emit(user_id, member, cached):
+        print_member_info(member, cached=cached)
+        if output:
+            output.write(json.dumps({"user_id": user_id, "cached": cached, "member": member},
+                                    ensure_ascii=False) + "\n")
+
+    def lookup(user_id):
+        member = fetch_chat_member(bot_token, chat_id, user_id)
+        if member is not None and cache:
+            cache.put(chat_id, user_id, member)
+        return user_id, member
+
+    ids = iter(user_ids)
+    try:
+        while True:
+            chunk = [user_id for _, user_id in zip(range(chunk_size), ids)]
+            if not chunk:
+                break
+            known = cache.get_many(chat_id, chunk) if cache else {}
+            for user_id in chunk:
+                if user_id in known:
+                    hits += 1
+                    emit(user_id, known[user_id], True)
+            misses = [user_id for user_id in chunk if user_id not in known]
+            if stop_requested():
+                break
+            futures = [submit_in_context(executor, lookup, user_id) for user_id in misses]
+            for user_id, member in (future.result() for future in futures):
+                if member is None:
+                    failed += 1
+                else:
+                    fetched += 1
+                    emit(user_id, member, False)
+    except KeyboardInterrupt:
+        print("\n[INFO] Interrupted.", file=sys.stderr)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        if output:
+            output.close()
+
+    elapsed = time.time() - start_time
+    print(f"[DONE] {hits + fetched} members resolved ({hits} from cache, {fetched} fetched), "
+          f"{failed} failed in {elapsed:.1f}s.")
+    return failed
 
 
 def get_bot_permissions(bot_token: str, chat_id: int):
     """
     Checks and prints the bot's permissions in a given chat.
     """
-    url = f"https://api.telegram.org/bot{bot_token}/getChatMember"
     bot_user_id = bot_token.split(":")[0]
     params = {"chat_id": chat_id, "user_id": bot_user_id}
-    resp = requests.get(url, params=params)
+    resp = call_bot_api(bot_token, "getChatMember", params=params)
     if not resp.ok:
         print(f"[ERROR] {resp.text}", file=sys.stderr)
         return
@@ -302,20 +1804,231 @@ def get_bot_permissions(bot_token: str, chat_id: int):
         print("[INFO] Bot is not an administrator; no detailed permissions available.")
 
 
+class FileCache:
+    """
+    On-disk cache of files downloaded from Telegram, shared by everything
+    that fetches media (the GUI's bot avatar, for one).
+
+    Files are stored under their file_unique_id, which stays the same for a
+    file whichever bot or file_id it is fetched with. An SQLite index in the
+    cache directory records each file's size and last use; once the total
+    exceeds 'max_bytes', the least recently used files are deleted.
+    Aliases (e.g. "avatar:<user_id>") remember for 'alias_ttl' seconds which
+    file a lookup returned, so a repeat lookup makes no API call at all.
+    The cache is safe to share between threads.
+    """
+
+    def __init__(self, directory: str = ".file_cache", max_bytes: int = 100 * 1024 * 1024,
+                 alias_ttl: float = 86400.0):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.alias_ttl = alias_ttl
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " file_unique_id TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS files_used ON files (used)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS aliases ("
+            " name TEXT PRIMARY KEY,"
+            " file_unique_id TEXT NOT NULL,"
+            " updated REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def _path(self, file_unique_id: str) -> str:
+        return os.path.join(self.directory, os.path.basename(file_unique_id))
+
+    def get(self, file_unique_id: str):
+        """
+        Returns the cached content of a file, or None if it is not cached.
+        """
+        with self._lock:
+            if not self.conn.execute("SELECT 1 FROM files WHERE file_unique_id = ?",
+                                     (file_unique_id,)).fetchone():
+                return None
+            try:
+                with open(self._path(file_unique_id), "rb") as f:
+                    data = f.read()
+            except OSError:
+                # Deleted behind our back: forget it
+                self.conn.execute("DELETE FROM files WHERE file_unique_id = ?", (file_unique_id,))
+                self.conn.commit()
+                return None
+            self.conn.execute("UPDATE files SET used = ? WHERE file_unique_id = ?",
+                              (time.time(), file_unique_id))
+            self.conn.commit()
+        return data
+
+    def put(self, file_unique_id: str, data: bytes):
+        """
+        Stores a file, then evicts least recently used files down to
+        max_bytes. Files larger than max_bytes on their own are not stored.
+        """
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(file_unique_id)
+        with self._lock:
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (file_unique_id, size, used) VALUES (?, ?, ?)",
+                (file_unique_id, len(data), time.time()),
+            )
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM files").fetchone()[0]
+            if total > self.max_bytes:
+                rows = self.conn.execute(
+                    "SELECT file_unique_id, size FROM files WHERE file_unique_id != ? ORDER BY used",
+                    (file_unique_id,),
+                ).fetchall()
+                for old_id, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    try:
+                        os.remove(self._path(old_id))
+                    except OSError:
+                        pass
+                    self.conn.execute("DELETE FROM files WHERE file_unique_id = ?", (old_id,))
+                    total -= size
+            self.conn.commit()
+
+    def alias(self, name: str):
+        """
+        Returns the file_unique_id recorded for 'name' ("" meaning "no file"),
+        or None if there is none younger than alias_ttl.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT file_unique_id FROM aliases WHERE name = ? AND updated >= ?",
+                (name, time.time() - self.alias_ttl),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_alias(self, name: str, file_unique_id: str):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO aliases (name, file_unique_id, updated) VALUES (?, ?, ?)",
+                (name, file_unique_id, time.time()),
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def fetch_file(bot_token: str, file_id: str, file_unique_id: str, cache: FileCache = None):
+    """
+    Returns the content of a Telegram file, from 'cache' if it holds it,
+    otherwise through getFile and a download (stored in 'cache' on the
+    way). Returns None, after printing the error, if the download fails.
+    """
+    data = cache.get(file_unique_id) if cache else None
+    if data is not None:
+        return data
+    try:
+        resp = call_bot_api(bot_token, "getFile", params={"file_id": file_id})
+        if not resp.ok:
+            locked_print(f"[ERROR] {resp.text}", file=sys.stderr)
+            return None
+        file_resp = get_api_client().download_file(bot_token, resp.json()["result"]["file_path"])
+    except requests.exceptions.RequestException as e:
+        locked_print(f"[ERROR] Download of file {file_unique_id} failed: {e}", file=sys.stderr)
+        return None
+    if not file_resp.ok:
+        locked_print(f"[ERROR] Download of file {file_unique_id} failed: HTTP {file_resp.status_code}",
+                     file=sys.stderr)
+        return None
+    if cache:
+        cache.put(file_unique_id, file_resp.content)
+    return file_resp.content
+
+
+def fetch_profile_photo(bot_token: str, user_id: int, cache: FileCache = None):
+    """
+    Returns the largest size of the user's current profile photo, or None
+    if they have none (or it cannot be fetched). With a cache, a repeat
+    call within the cache's alias_ttl makes no API call.
+    """
+    alias = f"avatar:{user_id}"
+    file_unique_id = cache.alias(alias) if cache else None
+    if file_unique_id == "":
+        return None
+    if file_unique_id is not None:
+        data = cache.get(file_unique_id)
+        if data is not None:
+            return data
+    try:
+        resp = call_bot_api(bot_token, "getUserProfilePhotos", params={"user_id": user_id, "limit": 1})
+    except requests.exceptions.RequestException as e:
+        locked_print(f"[ERROR] getUserProfilePhotos for {user_id} failed: {e}", file=sys.stderr)
+        return None
+    if not resp.ok:
+        locked_print(f"[ERROR] {resp.text}", file=sys.stderr)
+        return None
+    photos = resp.json()["result"]["photos"]
+    if not photos:
+        if cache:
+            cache.set_alias(alias, "")
+        return None
+    photo = photos[0][-1]
+    data = fetch_file(bot_token, photo["file_id"], photo["file_unique_id"], cache)
+    if cache and data is not None:
+        cache.set_alias(alias, photo["file_unique_id"])
+    return data
+
+
 # -------------------------------------------------------------------
-# 2. Enhanced dump_messages with KeyboardInterrupt and stop‐id
+# 3. Enhanced dump_messages with KeyboardInterrupt and stop‐id
 # -------------------------------------------------------------------
 
-# Global list to collect all successful forwarded message objects
-collected_messages = []
+# Upper bound of forwardMessages / copyMessages
+MAX_BATCH_SIZE = 100
+
+# Largest jump of --skip-gaps. Live blocks shorter than this that lie wholly
+# inside a jump are never requested, so it is kept well below usual block sizes
+DEFAULT_MAX_STRIDE = 32
+
+# Marks an ID whose request failed for network reasons (to retry on resume)
+NETWORK_ERROR = object()
+
+# 400 descriptions about the message itself (deleted, never existed, protected
+# content); other client errors concern the chat or the bot's rights
+MESSAGE_REJECTED = re.compile(r"messages? to (forward|copy) not found|can't be (forwarded|copied)"
+                              r"|MESSAGE_ID_INVALID", re.IGNORECASE)
+
+
+def message_rejected(response) -> bool:
+    """
+    True if an error 'response' to a forward means the message(s) can never be
+    forwarded, so they may be marked failed for good.
+    """
+    if response.status_code != 400:
+        return False
+    try:
+        description = response.json().get("description", "")
+    except ValueError:
+        description = response.text
+    return bool(MESSAGE_REJECTED.search(description))
 
 
 def forward_message(bot_token: str, chat_id: str, message_id: int):
     """
     Forwards a single message with message_id from chat_id back to chat_id.
-    Returns the 'result' field (Telegram message object) on success, None on failure.
+    Returns the 'result' field (Telegram message object) on success, None when
+    Telegram rejects the message (e.g. it was deleted). Network errors, 5xx,
+    unresolved 429 responses and client errors that are not about the message
+    (bad chat, missing rights) are re-raised as requests.RequestException so
+    the caller can tell them apart and retry later.
     """
-    url = f"https://api.telegram.org/bot{bot_token}/forwardMessage"
     payload = {
         "from_chat_id": chat_id,
         "chat_id": chat_id,
@@ -324,94 +2037,1009 @@ def forward_message(bot_token: str, chat_id: str, message_id: int):
     headers = {"Content-Type": "application/json"}
 
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = call_bot_api(bot_token, "forwardMessage", "POST", rate_chat=chat_id,
+                                json=payload, headers=headers)
     except requests.RequestException as e:
-        print(f"[ERROR] Request failed for message {message_id}: {e}", file=sys.stderr)
-        return None
+        locked_print(f"[ERROR] Request failed for message {message_id}: {e}", file=sys.stderr)
+        raise
 
     if response.status_code == 200:
-        print(f"[OK] Message {message_id} forwarded successfully.")
-        return response.json().get("result")  # Only store the message object :contentReference[oaicite:4]{index=4}
-    elif response.status_code == 429:
-        # Rate‐limited: wait and retry
-        print("[WARN] Rate limit encountered (429). Sleeping 15 seconds...", file=sys.stderr)
-        time.sleep(15)
-        return forward_message(bot_token, chat_id, message_id)
+        locked_print(f"[OK] Message {message_id} forwarded successfully.")
+        with trace_span("parse response", "json", bytes=len(response.content)):
+            return response.json().get("result")  # Only store the message object :contentReference[oaicite:4]{index=4}
     else:
-        print(f"[ERROR] Failed to forward message {message_id}: "
-              f"{response.status_code} – {response.text}", file=sys.stderr)
+        locked_print(f"[ERROR] Failed to forward message {message_id}: "
+                     f"{response.status_code} – {response.text}", file=sys.stderr)
+        if not message_rejected(response):
+            response.raise_for_status()
         return None
 
 
-def save_collected_messages(output_file: str):
+def forward_message_batch(bot_token: str, chat_id: str, message_ids: list, method: str = "forward"):
     """
-    Writes the collected_messages list into output_file as JSON. If no messages,
-    prints an informational note instead of creating an empty file.
+    Forwards (method="forward") or copies (method="copy") up to
+    MAX_BATCH_SIZE messages with a single forwardMessages / copyMessages call.
+    Returns {message_id: record or None}, None marking IDs Telegram rejected.
+
+    These methods only return the new MessageId objects, so a record holds
+    the new ID plus the source message and chat IDs, not the message content.
+    Telegram silently skips IDs it cannot forward without saying which; see
+    resolve_partial_batch(). A batch answered with an empty result, or with a
+    400 saying its messages do not exist, is rejected as a whole.
     """
-    if not collected_messages:
-        print("[INFO] No messages were collected. Exiting without writing file.", file=sys.stderr)
-        return
+    ordered = sorted(message_ids)  # the API wants strictly increasing IDs
+    if len(ordered) == 1:
+        return {ordered[0]: forward_message(bot_token, chat_id, ordered[0])}
 
+    api_method = "forwardMessages" if method == "forward" else "copyMessages"
+    payload = {
+        "from_chat_id": chat_id,
+        "chat_id": chat_id,
+        "message_ids": ordered
+    }
     try:
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(collected_messages, f, ensure_ascii=False, indent=4)
-        print(f"[DONE] {len(collected_messages)} messages written to '{output_file}'.")
-    except IOError as e:
-        print(f"[ERROR] Failed to write to {output_file}: {e}", file=sys.stderr)
+        response = call_bot_api(bot_token, api_method, "POST", rate_chat=chat_id, json=payload)
+    except requests.RequestException as e:
+        locked_print(f"[ERROR] Request failed for messages {ordered[0]}–{ordered[-1]}: {e}",
+                     file=sys.stderr)
+        raise
+    if not response.ok and not message_rejected(response):
+        # 429, 5xx, or a problem with the chat or the bot's rights: retried on resume
+        locked_print(f"[ERROR] {api_method} failed for messages {ordered[0]}–{ordered[-1]}: "
+                     f"{response.status_code} – {response.text}", file=sys.stderr)
+        response.raise_for_status()
+
+    with trace_span("parse response", "json", bytes=len(response.content)):
+        new_ids = (response.json().get("result") or []) if response.ok else []
+    if len(new_ids) == len(ordered):
+        locked_print(f"[OK] Messages {ordered[0]}–{ordered[-1]} forwarded in one batch.")
+        return batch_records(chat_id, ordered, new_ids)
+    if not new_ids:
+        # Nothing in this range can be forwarded
+        return {message_id: None for message_id in ordered}
+
+    locked_print(f"[WARN] {api_method} returned {len(new_ids)}/{len(ordered)} messages for "
+                 f"{ordered[0]}–{ordered[-1]}. Probing for the missing ones...", file=sys.stderr)
+    return resolve_partial_batch(bot_token, chat_id, ordered, new_ids)
+
+
+def batch_records(chat_id: str, message_ids: list, new_ids: list) -> dict:
+    return {
+        source_id: {"message_id": new_id.get("message_id"),
+                    "source_message_id": source_id,
+                    "source_chat_id": chat_id}
+        for source_id, new_id in zip(message_ids, new_ids)
+    }
 
 
-def handle_interrupt(signum, frame):
+def resolve_partial_batch(bot_token: str, chat_id: str, ordered: list, new_ids: list) -> dict:
     """
-    Signal handler for SIGINT (Ctrl+C). Saves collected messages and exits.
+    Tells which IDs of a batch Telegram skipped, given the 'new_ids' it
+    returned for the others. No method checks a message without posting it,
+    so IDs are probed one by one with forward_message(), lowest first, only
+    until as many are missing as the batch came back short. Telegram keeps
+    the order of the IDs, so the rest are all live and match the tail of
+    'new_ids'; they are never sent again. Live messages among the probed IDs
+    are posted a second time (at most once more per message).
     """
-    print("\n[INFO] KeyboardInterrupt detected. Saving collected messages...", file=sys.stderr)
-    # Use the OUTPUT_FILE from outer scope by setting a sentinel
-    save_collected_messages(OUTPUT_FILE_GLOBAL)
-    sys.exit(0)
+    missing = len(ordered) - len(new_ids)
+    results = {}
+    for message_id in ordered:
+        if missing <= 0:
+            break
+        results[message_id] = forward_message(bot_token, chat_id, message_id)
+        if results[message_id] is None:
+            missing -= 1
+
+    rest = ordered[len(results):]
+    if rest:
+        results.update(batch_records(chat_id, rest, new_ids[len(new_ids) - len(rest):]))
+    return results
+
+
+class MessageWriter:
+    """
+    Streams forwarded messages to output_file as they arrive.
+
+    'jsonl' (default) writes one JSON object per line; 'json' writes a JSON
+    array incrementally, kept for tools that expect the old format. Records
+    are flushed to the OS every 'flush_every' messages or 'flush_interval'
+    seconds, so a crash or kill -9 loses at most the last unflushed batch
+    (and with 'jsonl' the file stays readable up to the last full line).
+
+    With 'append_at' (jsonl only) an existing file is truncated to that byte
+    offset and extended instead of being overwritten; 'on_flush' is called
+    with the file size after every flush.
+    """
+
+    FORMATS = ("jsonl", "json")
+
+    def __init__(self, output_file: str, fmt: str = "jsonl", flush_every: int = 50,
+                 flush_interval: float = 2.0, append_at: int = None, on_flush=None):
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Unsupported output format: {fmt}")
+        if append_at is not None and fmt != "jsonl":
+            raise ValueError("Only the jsonl format can be appended to")
+        self.output_file = output_file
+        self.fmt = fmt
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.count = 0
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+        if append_at is not None and os.path.exists(output_file):
+            self._file = open(output_file, "r+", encoding="utf-8")
+            self._file.truncate(append_at)
+            self._file.seek(append_at)
+            self._appending = append_at > 0
+        else:
+            self._file = open(output_file, "w", encoding="utf-8")
+            self._appending = False
+        if fmt == "json":
+            self._file.write("[")
+
+    def write(self, message: dict, message_id: int = None):
+        if self.fmt == "jsonl":
+            self._file.write(json.dumps(message, ensure_ascii=False) + "\n")
+        else:
+            self._file.write(("," if self.count else "") + "\n")
+            self._file.write(json.dumps(message, ensure_ascii=False, indent=4))
+        self.count += 1
+        self._unflushed += 1
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        """
+        Flushes if the batch is full or the flush interval has elapsed.
+        """
+        if (self._unflushed >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        with trace_span("flush output", "io", messages=self._unflushed):
+            self._file.flush()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+        if self.on_flush is not None:
+            self.on_flush(self._file.tell())
+
+    def close(self):
+        """
+        Finishes the file and reports how many messages it holds. Safe to call twice.
+        """
+        if self._file.closed:
+            return
+        if self.fmt == "json":
+            self._file.write("\n]\n" if self.count else "]\n")
+        self.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        if self.count or self._appending:
+            print(f"[DONE] {self.count} messages written to '{self.output_file}'.")
+        else:
+            print("[INFO] No messages were collected. Removing empty output file.", file=sys.stderr)
+            os.remove(self.output_file)
+
+
+def original_date(message: dict):
+    """
+    Date of the message a forwarded copy was made from. The copy's own 'date'
+    is the time of the dump; 'forward_date' is the pre-Bot API 7.0 field.
+    """
+    origin = message.get("forward_origin") or {}
+    return origin.get("date") or message.get("forward_date") or message.get("date")
+
+
+class SqliteMessageWriter:
+    """
+    MessageWriter counterpart storing the dump in a SQLite database.
+
+    Messages go into a 'messages' table keyed by (chat_id, message_id), where
+    message_id is the ID in the dumped chat, with upsert semantics: dumping
+    the same range again (or resuming) updates rows instead of duplicating
+    them, and one database can hold any number of chats. Rows are buffered
+    and inserted in one transaction per flush (same policy as MessageWriter).
+    The 'messages_fts' FTS5 table indexes text and captions and is kept in
+    sync by triggers; see search_messages().
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS messages (
+            chat_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            date INTEGER,
+            text TEXT NOT NULL DEFAULT '',
+            data TEXT NOT NULL,
+            PRIMARY KEY (chat_id, message_id)
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+            text, content='messages', content_rowid='rowid'
+        );
+        CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts(rowid, text) VALUES (new.rowid, new.text);
+        END;
+        CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+        END;
+        CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+            INSERT INTO messages_fts(rowid, text) VALUES (new.rowid, new.text);
+        END;
+    """
+
+    UPSERT = """
+        INSERT INTO messages (chat_id, message_id, date, text, data) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (chat_id, message_id) DO UPDATE SET
+            date = excluded.date, text = excluded.text, data = excluded.data
+    """
+
+    def __init__(self, output_file: str, chat_id, flush_every: int = 50,
+                 flush_interval: float = 2.0, on_flush=None):
+        self.output_file = output_file
+        self.chat_id = int(chat_id) if str(chat_id).lstrip("-").isdigit() else chat_id
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.count = 0
+        self._rows = []
+        self._last_flush = time.monotonic()
+        self.conn = sqlite3.connect(output_file)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def write(self, message: dict, message_id: int = None):
+        if message_id is None:
+            message_id = message.get("source_message_id") or message.get("message_id")
+        text = message.get("text") or message.get("caption") or ""
+        self._rows.append((self.chat_id, message_id, original_date(message), text,
+                           json.dumps(message, ensure_ascii=False)))
+        self.count += 1
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        if (len(self._rows) >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        if self._rows:
+            with trace_span("flush output", "io", messages=len(self._rows)), self.conn:
+                self.conn.executemany(self.UPSERT, self._rows)  # one transaction per batch
+            self._rows = []
+        self._last_flush = time.monotonic()
+        if self.on_flush is not None:
+            self.on_flush(None)
+
+    def close(self):
+        """
+        Commits the last batch and closes the database. Safe to call twice.
+        """
+        if self.conn is None:
+            return
+        self.flush()
+        self.conn.close()
+        self.conn = None
+        print(f"[DONE] {self.count} messages written to '{self.output_file}'.")
+
+
+# Values of dump-messages -f
+OUTPUT_FORMATS = MessageWriter.FORMATS + ("sqlite",)
+
+
+def search_messages(database: str, query: str, chat_id=None, limit: int = 20,
+                    as_json: bool = False):
+    """
+    Full-text search over a database written by 'dump-messages -f sqlite'.
+    'query' uses the FTS5 syntax (words, "phrases", prefix*, AND/OR/NOT).
+    Prints the best matches first, with a highlighted snippet, or the
+    stored message objects as JSON lines with 'as_json'. Returns the number
+    of matches printed.
+    """
+    if not os.path.exists(database):
+        print(f"[ERROR] Database '{database}' not found.", file=sys.stderr)
+        return 0
+    conn = sqlite3.connect(database)
+    sql = (
+        "SELECT m.chat_id, m.message_id, m.date, m.data, "
+        "snippet(messages_fts, 0, '[', ']', '…', 12) "
+        "FROM messages_fts JOIN messages m ON m.rowid = messages_fts.rowid "
+        "WHERE messages_fts MATCH ?"
+    )
+    params = [query]
+    if chat_id is not None:
+        sql += " AND m.chat_id = ?"
+        params.append(chat_id)
+    sql += " ORDER BY rank LIMIT ?"
+    params.append(limit)
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    except sqlite3.OperationalError as e:
+        print(f"[ERROR] Search failed: {e}", file=sys.stderr)
+        return 0
+    finally:
+        conn.close()
+
+    for chat, message_id, date, data, snippet in rows:
+        if as_json:
+            print(data)
+        else:
+            when = time.strftime("%Y-%m-%d %H:%M", time.gmtime(date)) if date else "?"
+            print(f"[MATCH] chat {chat} · #{message_id} · {when} – {snippet}")
+    if not as_json:
+        print(f"[INFO] {len(rows)} matches.", file=sys.stderr)
+    return len(rows)
+
+
+class IdRangeSet:
+    """
+    Set of message IDs stored as sorted, disjoint [low, high] ranges, which
+    stays tiny for the mostly contiguous IDs a dump produces.
+    """
+
+    def __init__(self, ranges=()):
+        self.ranges = sorted([int(low), int(high)] for low, high in ranges)
+
+    def __contains__(self, message_id: int) -> bool:
+        i = bisect.bisect_right(self.ranges, [message_id, float("inf")]) - 1
+        return i >= 0 and self.ranges[i][0] <= message_id <= self.ranges[i][1]
+
+    def __len__(self) -> int:
+        return sum(high - low + 1 for low, high in self.ranges)
+
+    def add(self, message_id: int):
+        if message_id in self:
+            return
+        i = bisect.bisect_right(self.ranges, [message_id, float("inf")])
+        joins_left = i > 0 and self.ranges[i - 1][1] == message_id - 1
+        joins_right = i < len(self.ranges) and self.ranges[i][0] == message_id + 1
+        if joins_left and joins_right:
+            self.ranges[i - 1][1] = self.ranges.pop(i)[1]
+        elif joins_left:
+            self.ranges[i - 1][1] = message_id
+        elif joins_right:
+            self.ranges[i][0] = message_id
+        else:
+            self.ranges.insert(i, [message_id, message_id])
+
+    def floor(self, message_id: int):
+        """
+        Returns the highest ID of the set that is <= message_id, or None.
+        """
+        i = bisect.bisect_right(self.ranges, [message_id, float("inf")]) - 1
+        return None if i < 0 else min(self.ranges[i][1], message_id)
+
+    def add_range(self, low: int, high: int):
+        """
+        Adds every ID from low to high inclusive.
+        """
+        if low > high:
+            return
+        merged = [low, high]
+        kept = []
+        for r in self.ranges:
+            if r[1] < low - 1 or r[0] > high + 1:
+                kept.append(r)
+            else:
+                merged = [min(merged[0], r[0]), max(merged[1], r[1])]
+        bisect.insort(kept, merged)
+        self.ranges = kept
+
+
+class DumpCheckpoint:
+    """
+    Progress of one dump of (chat, start_id, stop_id), kept next to the output file.
+
+    'completed' holds IDs already written to the output, 'failed' those
+    Telegram rejected (deleted or unforwardable messages); both are skipped on
+    --resume. IDs lost to network errors are in neither and are retried.
+    'skipped' holds IDs --skip-gaps jumped over without requesting them; a
+    resumed run scans them again one by one.
+    'output_bytes' is the output size matching this state: a resumed run
+    truncates the output to it, so nothing is written twice. The file is
+    replaced atomically on every save.
+    """
+
+    def __init__(self, path: str, chat_id: str, start_id: int, stop_id):
+        self.path = path
+        self.chat_id = str(chat_id)
+        self.start_id = start_id
+        self.stop_id = stop_id
+        self.completed = IdRangeSet()
+        self.failed = IdRangeSet()
+        self.skipped = IdRangeSet()
+        self.output_bytes = 0
+
+    @staticmethod
+    def path_for(output_file: str, chat_id: str, start_id: int, stop_id) -> str:
+        stop = "none" if stop_id is None else stop_id
+        return f"{output_file}.checkpoint.{chat_id}_{start_id}_{stop}.json"
+
+    @classmethod
+    def load(cls, path: str, chat_id: str, start_id: int, stop_id):
+        checkpoint = cls(path, chat_id, start_id, stop_id)
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        checkpoint.completed = IdRangeSet(state.get("completed", []))
+        checkpoint.failed = IdRangeSet(state.get("failed", []))
+        checkpoint.skipped = IdRangeSet(state.get("skipped", []))
+        checkpoint.output_bytes = state.get("output_bytes", 0)
+        return checkpoint
+
+    def is_done(self, message_id: int) -> bool:
+        return message_id in self.completed or message_id in self.failed
+
+    def save(self, output_bytes: int = None):
+        if output_bytes is not None:
+            self.output_bytes = output_bytes
+        state = {
+            "chat_id": self.chat_id,
+            "start_id": self.start_id,
+            "stop_id": self.stop_id,
+            "output_bytes": self.output_bytes,
+            "completed": self.completed.ranges,
+            "failed": self.failed.ranges,
+            "skipped": self.skipped.ranges,
+            "updated": int(time.time()),
+        }
+        tmp_path = self.path + ".tmp"
+        with trace_span("save checkpoint", "io"):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+
+def handle_interrupt(interrupted: threading.Event):
+    """
+    Returns the SIGINT (Ctrl+C) handler of a dump. It only sets 'interrupted':
+    the dump then stops handing out IDs, writes the results in flight and
+    closes its output as on a normal end, so a Ctrl+C can never land between
+    marking an ID done and writing its record. A second Ctrl+C quits at once;
+    the checkpoint of the last flush still matches the output then.
+    """
+    def handler(signum, frame):
+        if interrupted.is_set():
+            sys.exit(130)
+        interrupted.set()
+        print("\n[INFO] KeyboardInterrupt detected. Saving collected messages "
+              "(Ctrl+C again to quit now)...", file=sys.stderr)
+
+    return handler
+
+
+class MessageIdScheduler:
+    """
+    Hands out the message IDs of a dump, highest first, in batches of up to
+    'batch_size' consecutive IDs. IDs the checkpoint already covers are left
+    out and at most 'max_attempts' IDs are handed out.
+
+    With gap_threshold > 0, observe() counts consecutive misses in ID order.
+    Once 'gap_threshold' of them are seen, the scheduler stops scanning and
+    gallops: it sends single probes 2, 4, 8, … (up to max_stride) IDs further
+    down until one finds a live message. The IDs between that hit and the
+    previous missed probe are then scanned one by one, and normal scanning
+    resumes below the hit. IDs jumped over between two missed probes are
+    never requested, so a live block shorter than max_stride can be missed;
+    they are recorded in 'skipped' and, if given, in the 'record' set (the
+    checkpoint's, so that --resume can rescan them).
+
+    IDs in 'rescan' (skipped by an earlier run) are always scanned one by
+    one: misses there do not start a gallop and probes never jump over them.
+    """
+
+    def __init__(self, start_id: int, lowest_id: int, is_done, batch_size: int = 1,
+                 max_attempts: int = 16000, gap_threshold: int = 0,
+                 max_stride: int = DEFAULT_MAX_STRIDE, rescan: IdRangeSet = None,
+                 record: IdRangeSet = None):
+        self.next_id = start_id
+        self.lowest_id = lowest_id
+        self.is_done = is_done
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.gap_threshold = gap_threshold
+        self.max_stride = max(2, max_stride)
+        self.attempts = 0
+        self.probes = 0
+        self.skipped = IdRangeSet()
+        self.rescan = rescan if rescan is not None else IdRangeSet()
+        self.record = record
+        self._misses = 0
+        self._mode = "scan"       # "scan", "gallop" or "fill"
+        self._probe = None        # probe in flight while galloping
+        self._last_miss = None    # lowest ID known to be inside the gap
+        self._stride = 2
+        self._fill_end = None     # the hit that ends the current fill
+
+    @property
+    def budget_exhausted(self) -> bool:
+        return self.attempts >= self.max_attempts
+
+    def next_batch(self):
+        """
+        Returns the next list of IDs to request, or None if there is nothing
+        to hand out right now (finished, out of budget, or waiting for a probe).
+        """
+        if self._mode == "gallop":
+            if self.budget_exhausted:
+                return None
+            probe = self._next_probe()
+            if self._mode == "gallop":
+                return probe
+
+        batch = []
+        while len(batch) < self.batch_size and self.next_id >= self.lowest_id \
+                and not self.budget_exhausted:
+            message_id = self.next_id
+            self.next_id -= 1
+            if self._mode == "fill" and message_id == self._fill_end:
+                # The hit itself was already fetched by its probe
+                self._mode = "scan"
+                if batch:
+                    break
+                continue
+            if not self.is_done(message_id):
+                batch.append(message_id)
+                self.attempts += 1
+        return batch or None
+
+    def _skip(self, low: int, high: int):
+        self.skipped.add_range(low, high)
+        if self.record is not None:
+            self.record.add_range(low, high)
+
+    def _next_probe(self):
+        if self._probe is not None or self._last_miss <= self.lowest_id:
+            return None
+        probe = max(self._last_miss - self._stride, self.lowest_id)
+        rescan = self.rescan.floor(self._last_miss - 1)
+        if rescan is not None and rescan >= probe:
+            # Stop galloping at IDs that must be scanned one by one
+            self._skip(rescan + 1, self._last_miss - 1)
+            self._mode = "scan"
+            self.next_id = rescan
+            return None
+        while self.is_done(probe) and probe > self.lowest_id:
+            probe -= 1
+        if self.is_done(probe):
+            # The gap runs into the bottom of the range
+            self._skip(probe + 1, self._last_miss - 1)
+            self._last_miss = probe
+            return None
+        self._probe = probe
+        self.attempts += 1
+        self.probes += 1
+        return [probe]
+
+    def is_probe(self, batch) -> bool:
+        return self._mode == "gallop" and batch == [self._probe]
+
+    def observe(self, message_id: int, found: bool):
+        """
+        Feeds back the outcome of a scanned ID, in descending ID order.
+        """
+        if found or message_id in self.rescan:
+            self._misses = 0
+            return
+        self._misses += 1
+        if self.gap_threshold and self._mode == "scan" and self._misses >= self.gap_threshold:
+            # Everything above next_id has been handed out already
+            self._mode = "gallop"
+            self._last_miss = self.next_id + 1
+            self._stride = 2
+            self._misses = 0
+
+    def probe_result(self, message_id: int, found: bool):
+        """
+        Feeds back the outcome of the probe returned by the last next_batch().
+        """
+        self._probe = None
+        if found:
+            # Scan back over the last stride, then continue below the hit
+            self._mode = "fill"
+            self._fill_end = message_id
+            self.next_id = self._last_miss - 1
+        else:
+            self._skip(message_id + 1, self._last_miss - 1)
+            self._last_miss = message_id
+            self._stride = min(2 * self._stride, self.max_stride)
+            if message_id <= self.lowest_id:
+                self.next_id = message_id - 1
 
 
 def dump_messages(bot_token: str, chat_id: str, start_id: int, stop_id: int or None,
-                  output_file: str, max_iters: int = 16000):
+                  output_file: str, max_iters: int = 16000, workers: int = 1,
+                  output_format: str = "jsonl", resume: bool = False, batch_size: int = 1,
+                  batch_method: str = "forward", skip_gaps: int = 0,
+                  max_stride: int = DEFAULT_MAX_STRIDE,
+                  progress=None):
     """
     Iteratively forwards messages from 'start_id' downward. Stops if:
-      • message_id < stop_id (if stop_id is provided)
-      • reached max_iters
+      • message_id < stop_id (if stop_id is provided, else below ID 1)
+      • max_iters message IDs were attempted
       • user presses Ctrl+C
-    """
-    global OUTPUT_FILE_GLOBAL
-    OUTPUT_FILE_GLOBAL = output_file  # For use in the signal handler
 
-    message_id = start_id
-    iteration = 0
+    With workers > 1, up to 2 × workers forwardMessage requests are kept in
+    flight: the ID range is handed out to the worker pool in descending order
+    and results are collected back in that same order, so the output file is
+    still sorted by message ID. Each message is appended to the output file
+    as soon as its turn comes (see MessageWriter), so memory use does not
+    grow with the size of the dump.
+
+    Progress is checkpointed next to the output file (see DumpCheckpoint).
+    With resume=True, IDs already written or rejected by a previous run are
+    skipped and new messages are appended to the existing output.
+
+    batch_size > 1 sends up to that many consecutive IDs per forwardMessages
+    / copyMessages call (see forward_message_batch for what is recorded).
+
+    skip_gaps > 0 jumps over long runs of deleted IDs once that many misses
+    in a row are seen (see MessageIdScheduler); skipped IDs cost no requests
+    and do not count against max_iters.
+
+    bot_token may also be a list of tokens of bots that can all read the
+    chat. Each request then goes out with whichever bot has rate budget
+    left (see RateGovernor.pick_token), and results are merged in ID order.
+
+    'progress', if given, is called about once per second (and once at the
+    end) with a dict of counters: attempted, written, failed, network_errors,
+    skipped and elapsed seconds, plus the estimates 'fraction' (0–1),
+    'rate' (messages written per second) and 'eta' (seconds, or None).
+    The final counters are also returned.
+    """
+    bot_tokens = [bot_token] if isinstance(bot_token, str) else list(bot_token)
+    workers = max(1, workers)
+    batch_size = min(max(1, batch_size), MAX_BATCH_SIZE)
     print(f"[INFO] Starting dump from message ID {start_id}", file=sys.stderr)
     if stop_id is not None:
         print(f"[INFO] Will stop when message_id < {stop_id}", file=sys.stderr)
     print(f"[INFO] Max iterations = {max_iters}", file=sys.stderr)
+    if workers > 1:
+        print(f"[INFO] Concurrent mode: {workers} workers", file=sys.stderr)
+    if len(bot_tokens) > 1:
+        print(f"[INFO] Sharding requests across {len(bot_tokens)} bot tokens", file=sys.stderr)
+    if skip_gaps:
+        print(f"[INFO] Gap skipping after {skip_gaps} consecutive misses", file=sys.stderr)
+    if batch_size > 1:
+        print(f"[INFO] Batch mode: up to {batch_size} messages per {batch_method}Messages call",
+              file=sys.stderr)
+    chat_rate = rate_governor.chat_rate(chat_id)
+    if workers > 1 and chat_rate > 0:
+        print(f"[WARN] Forwards into this chat are limited to {chat_rate:g}/min (--chat-rate), "
+              f"which caps the dump whatever -w is. Use -b to post up to {MAX_BATCH_SIZE} "
+              f"messages per request, or --chat-rate 0 if the chat is exempt.", file=sys.stderr)
     print("Press Ctrl+C to stop at any time and save progress.\n", file=sys.stderr)
 
+    checkpoint_path = DumpCheckpoint.path_for(output_file, chat_id, start_id, stop_id)
+    if resume and os.path.exists(checkpoint_path):
+        if output_format == "json":
+            print("[ERROR] --resume requires the jsonl or sqlite output format.", file=sys.stderr)
+            return
+        checkpoint = DumpCheckpoint.load(checkpoint_path, chat_id, start_id, stop_id)
+        print(f"[INFO] Resuming from '{checkpoint_path}': {len(checkpoint.completed)} done, "
+              f"{len(checkpoint.failed)} failed", file=sys.stderr)
+        if checkpoint.skipped:
+            print(f"[INFO] Rescanning {len(checkpoint.skipped)} IDs skipped by --skip-gaps "
+                  f"one by one", file=sys.stderr)
+        append_at = checkpoint.output_bytes
+    else:
+        if resume:
+            print(f"[WARN] No checkpoint found at '{checkpoint_path}'. Starting from scratch.",
+                  file=sys.stderr)
+        checkpoint = DumpCheckpoint(checkpoint_path, chat_id, start_id, stop_id)
+        append_at = None
+    if output_format == "sqlite":
+        writer = SqliteMessageWriter(output_file, chat_id, on_flush=checkpoint.save)
+    else:
+        writer = MessageWriter(output_file, output_format, append_at=append_at,
+                               on_flush=checkpoint.save)
+
     # Register the Ctrl+C signal handler
-    signal.signal(signal.SIGINT, handle_interrupt)  # :contentReference[oaicite:5]{index=5}
+    interrupted = threading.Event()
+    previous_handler = None
+    if threading.current_thread() is threading.main_thread():
+        previous_handler = signal.signal(signal.SIGINT, handle_interrupt(interrupted))  # :contentReference[oaicite:5]{index=5}
+
+    if workers > 1:
+        get_api_client().prewarm(workers)
+
+    # IDs are handed out highest first; IDs a resumed checkpoint covers
+    # already count against the max_iters budget
+    lowest_id = stop_id if stop_id is not None else 1
+    budget = max_iters - len(checkpoint.completed) - len(checkpoint.failed)
+    scheduler = MessageIdScheduler(
+        start_id, lowest_id, checkpoint.is_done, batch_size=batch_size,
+        max_attempts=budget, gap_threshold=skip_gaps, max_stride=max_stride,
+        rescan=IdRangeSet(checkpoint.skipped.ranges), record=checkpoint.skipped
+    )
 
-    while iteration < max_iters:
-        if stop_id is not None and message_id < stop_id:
-            print(f"[INFO] Reached stop_id threshold ({stop_id}). Stopping.", file=sys.stderr)
-            break
+    def fetch(batch):
+        token = rate_governor.pick_token(bot_tokens, chat_id)
+        return forward_message_batch(token, chat_id, batch, batch_method)
+
+    # Results waiting for their turn to be written, and the next ID to write
+    resolved = {}
+    cursor = start_id
+    stats = {"written": 0, "failed": 0, "network_errors": 0}
+    started = time.monotonic()
+    last_report = started
+
+    def report(final=False):
+        nonlocal last_report
+        now = time.monotonic()
+        if progress is None or (not final and now - last_report < 1.0):
+            return
+        last_report = now
+        elapsed = now - started
+        # Share of the ID range behind the cursor, or of the request budget
+        # if that runs out first
+        fraction = max((start_id - cursor) / max(1, start_id - lowest_id + 1),
+                       scheduler.attempts / budget if budget > 0 else 1.0)
+        fraction = 1.0 if final else min(fraction, 1.0)
+        progress(dict(stats, attempted=scheduler.attempts, skipped=len(scheduler.skipped),
+                      elapsed=round(elapsed, 3), final=final, fraction=round(fraction, 4),
+                      rate=round(stats["written"] / elapsed, 2) if elapsed else 0.0,
+                      eta=round(elapsed * (1 - fraction) / fraction, 1) if fraction else None))
+
+    def write_resolved(final=False):
+        nonlocal cursor
+        while cursor >= lowest_id:
+            if final and not resolved:
+                return
+            if checkpoint.is_done(cursor) or cursor in scheduler.skipped:
+                cursor -= 1
+                continue
+            if cursor not in resolved:
+                if not final:
+                    return
+                cursor -= 1
+                continue
+            message_id, result = cursor, resolved.pop(cursor)
+            cursor -= 1
+            if result is NETWORK_ERROR:
+                stats["network_errors"] += 1
+                continue  # not recorded in the checkpoint: retried by the next --resume
+            if result:
+                # Marked before writing so every flushed record is covered by the checkpoint
+                checkpoint.completed.add(message_id)
+                writer.write(result, message_id)
+                stats["written"] += 1
+            else:
+                checkpoint.failed.add(message_id)
+                stats["failed"] += 1
+                locked_print(f"[WARN] Message {message_id} not found or error. Continuing...",
+                             file=sys.stderr)
+            if not final:
+                scheduler.observe(message_id, bool(result))
+
+    # In-flight requests: future -> batch of IDs
+    in_flight = {}
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dump")
+    try:
+        while True:
+            while len(in_flight) < 2 * workers and not stop_requested() \
+                    and not interrupted.is_set():
+                batch = scheduler.next_batch()
+                if batch is None:
+                    break
+                future = submit_in_context(pool, fetch, batch)
+                in_flight[future] = batch
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = in_flight.pop(future)
+                try:
+                    results = future.result()
+                except requests.RequestException:
+                    locked_print(f"[WARN] Message(s) {batch[0]}–{batch[-1]} skipped after a network "
+                                 f"or API error (retried on --resume). Continuing...", file=sys.stderr)
+                    emit_event("error", kind="network", first_id=batch[0], last_id=batch[-1])
+                    results = {message_id: NETWORK_ERROR for message_id in batch}
+                resolved.update(results)
+                if scheduler.is_probe(batch):
+                    scheduler.probe_result(batch[0], results[batch[0]] not in (None, NETWORK_ERROR))
+            write_resolved()
+            writer.maybe_flush()
+            report()
+        # Probes whose fill-in was cut short by the budget
+        write_resolved(final=True)
+    finally:
+        # Drop queued requests on Ctrl+C; only those already running are awaited
+        for future in in_flight:
+            future.cancel()
+        pool.shutdown(wait=True)
+        if previous_handler is not None:
+            signal.signal(signal.SIGINT, previous_handler)
+
+    if scheduler.skipped:
+        print(f"[INFO] Skipped {len(scheduler.skipped)} IDs inside deleted ranges "
+              f"({scheduler.probes} probes).", file=sys.stderr)
+    if interrupted.is_set() or stop_requested():
+        print("[INFO] Stopped before the end of the range; --resume continues from here.",
+              file=sys.stderr)
+    elif scheduler.budget_exhausted:
+        print(f"[INFO] Reached max iterations ({max_iters}). Stopping.", file=sys.stderr)
+    elif stop_id is not None:
+        print(f"[INFO] Reached stop_id threshold ({stop_id}). Stopping.", file=sys.stderr)
+
+    # After the loop (either normal or due to stop condition), finish the file
+    writer.close()
+    print(f"[INFO] Checkpoint saved to '{checkpoint_path}'.", file=sys.stderr)
+    report(final=True)
+    return dict(stats, attempted=scheduler.attempts, skipped=len(scheduler.skipped),
+                elapsed=time.monotonic() - started)
 
-        result = forward_message(bot_token, chat_id, message_id)
-        if result:
-            collected_messages.append(result)
-        else:
-            print(f"[WARN] Message {message_id} not found or error. Continuing...", file=sys.stderr)
 
-        message_id -= 1
-        iteration += 1
+# -------------------------------------------------------------------
+# 4. run-jobs: several dumps in parallel worker processes
+# -------------------------------------------------------------------
 
-    # After the loop (either normal or due to stop condition), write out the JSON
-    save_collected_messages(output_file)  # :contentReference[oaicite:6]{index=6}
+# Optional per-job settings of a job file, with the dump_messages argument they map to
+JOB_OPTIONS = {
+    "max_iterations": "max_iters",
+    "workers": "workers",
+    "format": "output_format",
+    "resume": "resume",
+    "batch_size": "batch_size",
+    "batch_method": "batch_method",
+    "skip_gaps": "skip_gaps",
+    "max_stride": "max_stride",
+}
+
+
+def load_jobs(path: str) -> list:
+    """
+    Reads a job file ('-' for stdin): either a JSON array or JSON Lines, one
+    object per job with 'chat', 'start' and 'output' keys, plus optional
+    'stop', 'name', 'log', 'token' / 'tokens' and any key of JOB_OPTIONS.
+    """
+    if path == "-":
+        text = sys.stdin.read()
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    text = text.strip()
+    if text.startswith("["):
+        jobs = json.loads(text)
+    else:
+        jobs = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    for number, job in enumerate(jobs, 1):
+        missing = [key for key in ("chat", "start", "output") if key not in job]
+        if missing:
+            raise ValueError(f"Job {number} is missing {', '.join(missing)}")
+        job.setdefault("name", f"{job['chat']}:{os.path.basename(job['output'])}")
+        job.setdefault("log", job["output"] + ".log")
+    return jobs
+
+
+def run_dump_job(job: dict, options: dict, events):
+    """
+    Worker-process entry point of run-jobs: runs one dump with its console
+    output redirected to the job's log file, and reports its counters to the
+    parent through the 'events' queue as (job name, counters) tuples. Pool
+    processes are reused, so the streams are restored when the job ends.
+    """
+    with open(job["log"], "a", encoding="utf-8", buffering=1) as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        settings = use_api_settings(options["rate"], options["chat_rate"],
+                                    base_url=options["api_url"],
+                                    connect_timeout=options["connect_timeout"],
+                                    read_timeout=options["read_timeout"],
+                                    pool_size=max(10, 2 * job.get("workers", options["workers"])))
+
+        tokens = job.get("tokens") or ([job["token"]] if "token" in job else options["tokens"])
+        kwargs = {"workers": options["workers"], "resume": options["resume"]}
+        kwargs.update({arg: job[key] for key, arg in JOB_OPTIONS.items() if key in job})
+        metrics = ApiMetrics("run-jobs") if options.get("metrics") else None
+        metrics_token = api_metrics.set(metrics)
+        try:
+            with settings:
+                result = dump_messages(
+                    bot_token=tokens,
+                    chat_id=str(job["chat"]),
+                    start_id=int(job["start"]),
+                    stop_id=job.get("stop"),
+                    output_file=job["output"],
+                    progress=lambda counters: events.put((job["name"], counters)),
+                    **kwargs
+                )
+        finally:
+            api_metrics.reset(metrics_token)
+        if metrics:
+            # Sent back with the result and merged into the parent's metrics
+            result = dict(result or {}, metrics=metrics.snapshot())
+        return result
+
+
+def run_jobs(jobs: list, options: dict, parallel: int = 4, report_every: float = 5.0):
+    """
+    Runs every job of 'jobs' in a pool of 'parallel' worker processes, prints
+    each running job's progress every 'report_every' seconds and a summary
+    at the end. Returns True if all jobs completed.
+
+    The bot-wide --rate budget is split evenly between the jobs that run at
+    the same time, since they usually share a token.
+    """
+    parallel = max(1, min(parallel, len(jobs)))
+    options = dict(options, rate=options["rate"] / parallel)
+    for job in jobs:
+        if not (job.get("tokens") or job.get("token") or options["tokens"]):
+            raise ValueError(f"Job '{job['name']}' has no token and no -t was given")
+
+    print(f"[INFO] Running {len(jobs)} dump jobs, {parallel} at a time. "
+          f"Per-job output goes to '<output>.log'.", file=sys.stderr)
+    manager = multiprocessing.Manager()
+    events = manager.Queue()
+    latest = {}
+    results = {}
+    pool = ProcessPoolExecutor(max_workers=parallel)
+    futures = {pool.submit(run_dump_job, job, options, events): job for job in jobs}
+    last_report = time.monotonic()
+    try:
+        while len(results) < len(jobs):
+            try:
+                name, counters = events.get(timeout=0.5)
+                latest[name] = counters
+                emit_event("progress", command="run-jobs", job=name, **counters)
+            except queue.Empty:
+                pass
+
+            for future, job in futures.items():
+                if job["name"] in results or not future.done():
+                    continue
+                try:
+                    results[job["name"]] = future.result() or {}
+                    if "metrics" in results[job["name"]]:
+                        api_metrics.get().merge(results[job["name"]].pop("metrics"))
+                    print(f"[JOB DONE] {job['name']}", file=sys.stderr)
+                    emit_event("result", command="run-jobs", job=job["name"], **results[job["name"]])
+                except BaseException as e:  # includes SystemExit from a job's Ctrl+C handler
+                    results[job["name"]] = {"error": str(e) or type(e).__name__}
+                    print(f"[JOB FAILED] {job['name']}: {results[job['name']]['error']}",
+                          file=sys.stderr)
+                    emit_event("error", kind="job", job=job["name"], message=results[job["name"]]["error"])
+
+            if time.monotonic() - last_report >= report_every:
+                last_report = time.monotonic()
+                for name, counters in latest.items():
+                    if name not in results:
+                        rate = counters["written"] / counters["elapsed"] if counters["elapsed"] else 0
+                        print(f"[JOB] {name}: {counters['written']} written, "
+                              f"{counters['failed']} failed, {counters['attempted']} attempted "
+                              f"({rate:.1f} msg/s)", file=sys.stderr)
+    except KeyboardInterrupt:
+        print("\n[INFO] Interrupted. Jobs keep their checkpoints; re-run with --resume.",
+              file=sys.stderr)
+    finally:
+        for future in futures:
+            future.cancel()
+        pool.shutdown(wait=True)
+        manager.shutdown()
+
+    print("\nJob summary:")
+    ok = True
+    for job in jobs:
+        result = results.get(job["name"])
+        if result is None or "error" in result:
+            ok = False
+            reason = "not run" if result is None else f"failed: {result['error']}"
+            print(f" · {job['name']} – {reason}")
+            continue
+        elapsed = result.get("elapsed", 0)
+        rate = result.get("written", 0) / elapsed if elapsed else 0
+        print(f" · {job['name']} – {result.get('written', 0)} written, "
+              f"{result.get('failed', 0)} failed, {result.get('network_errors', 0)} network errors, "
+              f"{result.get('skipped', 0)} skipped in {elapsed:.1f}s ({rate:.1f} msg/s)")
+    return ok
 
 
 # -------------------------------------------------------------------
-# 3. CLI parser configuration with argparse (all in English)
+# 5. CLI parser configuration with argparse (all in English)
 # -------------------------------------------------------------------
 
 def build_arg_parser():
@@ -431,11 +3059,75 @@ def build_arg_parser():
 
     subparsers = parser.add_subparsers(dest="command", required=True)
 
+    # Connection, rate-limit and reporting options
+    network = argparse.ArgumentParser(add_help=False)
+    network.add_argument(
+        "--progress-json", dest="progress_json", action="store_true",
+        help="Write machine-readable events (start, progress, error, result,\n"
+             "exit) to stdout as JSON lines; other output goes to stderr"
+    )
+    network.add_argument(
+        "--rate", dest="rate", type=float, default=30.0,
+        help="Bot-wide request budget per second (default: 30, 0 = unlimited)"
+    )
+    network.add_argument(
+        "--chat-rate", dest="chat_rate", type=float, default=None,
+        help=f"Messages per minute sent into a single chat (default: "
+             f"{DEFAULT_GROUP_CHAT_RATE:g} for groups,\n"
+             f"{DEFAULT_PRIVATE_CHAT_RATE:g} for private chats, Telegram's limits; 0 = unlimited).\n"
+             "dump-messages forwards into the chat it reads, so this also caps its\n"
+             "speed whatever -w is; batches (-b) post up to 100 messages per request"
+    )
+    network.add_argument(
+        "--metrics", dest="metrics", nargs="?", const="-", default=None, metavar="FILE",
+        help="Collect per-method Bot API statistics (requests, latency histogram,\n"
+             "bytes, 429s, throttled time) and write them as JSON at exit, to FILE\n"
+             "or to stderr if no FILE is given"
+    )
+    network.add_argument(
+        "--metrics-textfile", dest="metrics_textfile", default=None, metavar="FILE",
+        help="Also keep FILE updated with the statistics in Prometheus text format\n"
+             "(for the node_exporter textfile collector)"
+    )
+    network.add_argument(
+        "--metrics-interval", dest="metrics_interval", type=float, default=15.0,
+        help="Seconds between --metrics-textfile updates (default: 15)"
+    )
+    network.add_argument(
+        "--trace", dest="trace", default=None, metavar="FILE",
+        help="Record a timeline of the run to FILE in Chrome trace format (one span\n"
+             "per Bot API call, HTTP request, connection, rate-limit sleep and write);\n"
+             "open it in https://ui.perfetto.dev or chrome://tracing"
+    )
+    network.add_argument(
+        "--profile", dest="profile", default=None, metavar="FILE",
+        help="Sample the stacks of all threads during the command and write them to\n"
+             "FILE as collapsed stacks (for speedscope or flamegraph.pl)"
+    )
+    network.add_argument(
+        "--profile-interval", dest="profile_interval", type=float, default=0.005,
+        help="Seconds between --profile samples (default: 0.005)"
+    )
+    network.add_argument(
+        "--api-url", dest="api_url", default=os.environ.get("TELEGRAM_API_URL", API_BASE_URL),
+        help="Bot API server to use (default: $TELEGRAM_API_URL, else\n"
+             "https://api.telegram.org), e.g. a local Bot API server or mock_bot_api.py"
+    )
+    network.add_argument(
+        "--connect-timeout", dest="connect_timeout", type=float, default=10.0,
+        help="Seconds to wait for a connection to the Bot API (default: 10)"
+    )
+    network.add_argument(
+        "--read-timeout", dest="read_timeout", type=float, default=30.0,
+        help="Seconds to wait for a Bot API response (default: 30)"
+    )
+
     # Common arguments
-    common = argparse.ArgumentParser(add_help=False)
+    common = argparse.ArgumentParser(add_help=False, parents=[network])
     common.add_argument(
-        "-t", "--token", dest="token", required=True,
-        help="Bot authentication token"
+        "-t", "--token", dest="token", required=True, action="append",
+        help="Bot authentication token (dump-messages accepts several -t to\n"
+             "spread requests across bots that are members of the chat)"
     )
     common.add_argument(
         "-c", "--chat", dest="chat", type=int, required=True,
@@ -446,10 +3138,23 @@ def build_arg_parser():
     parser_add = subparsers.add_parser(
         "add-members", help="Generate invite link & add a user", parents=[common]
     )
-    parser_add.add_argument(
-        "-u", "--user", dest="user", type=int, required=True,
+    users = parser_add.add_mutually_exclusive_group(required=True)
+    users.add_argument(
+        "-u", "--user", dest="user", type=int,
         help="ID of the user to add"
     )
+    users.add_argument(
+        "-U", "--users-file", dest="users_file",
+        help="File with one user ID per line ('-' for stdin)"
+    )
+    parser_add.add_argument(
+        "-w", "--workers", dest="workers", type=int, default=4,
+        help="Users added concurrently with --users-file (default: 4)"
+    )
+    parser_add.add_argument(
+        "--report", dest="report", default=None,
+        help="Append one JSON line per user (user_id, ok, error) to this file"
+    )
 
     # get-admins
     parser_admins = subparsers.add_parser(
@@ -462,7 +3167,50 @@ def build_arg_parser():
     )
     parser_listen.add_argument(
         "-d", "--duration", dest="duration", type=int, default=60,
-        help="Seconds to listen for new users (default: 60s)"
+        help="Seconds to listen for new users, 0 = until Ctrl+C (default: 60s)"
+    )
+    parser_listen.add_argument(
+        "--offset-file", dest="offset_file", default=None,
+        help="File keeping the last update ID between runs\n"
+             "(default: .listen_offset_<BOT_ID>.json)"
+    )
+    parser_listen.add_argument(
+        "--poll-timeout", dest="poll_timeout", type=int, default=30,
+        help="Seconds each getUpdates long poll may wait, max 50 (default: 30)"
+    )
+    parser_listen.add_argument(
+        "--webhook-url", dest="webhook_url", default=None,
+        help="Receive updates through a webhook at this public HTTPS URL\n"
+             "instead of polling getUpdates"
+    )
+    parser_listen.add_argument(
+        "--listen-host", dest="listen_host", default="0.0.0.0",
+        help="Address the webhook receiver binds to (default: 0.0.0.0)"
+    )
+    parser_listen.add_argument(
+        "--listen-port", dest="listen_port", type=int, default=8443,
+        help="Port the webhook receiver binds to (default: 8443)"
+    )
+    parser_listen.add_argument(
+        "--webhook-secret", dest="webhook_secret", default=None,
+        help="Secret token Telegram sends with every delivery; others get 403"
+    )
+    parser_listen.add_argument(
+        "--cert", dest="cert", default=None,
+        help="PEM certificate to serve HTTPS with (uploaded to Telegram, so\n"
+             "self-signed certificates work)"
+    )
+    parser_listen.add_argument(
+        "--key", dest="key", default=None,
+        help="Private key of --cert, if not in the same file"
+    )
+    parser_listen.add_argument(
+        "--queue-size", dest="queue_size", type=int, default=1000,
+        help="Updates buffered before deliveries are refused (default: 1000)"
+    )
+    parser_listen.add_argument(
+        "--no-register", dest="register", action="store_false",
+        help="Do not call setWebhook/deleteWebhook (for local testing)"
     )
 
     # get-invite
@@ -474,10 +3222,36 @@ def build_arg_parser():
     parser_member = subparsers.add_parser(
         "get-member", help="Fetch info for a chat member", parents=[common]
     )
-    parser_member.add_argument(
-        "-u", "--user", dest="user", type=int, required=True,
+    member_users = parser_member.add_mutually_exclusive_group(required=True)
+    member_users.add_argument(
+        "-u", "--user", dest="user", type=int,
         help="ID of the user to fetch info for"
     )
+    member_users.add_argument(
+        "-U", "--users-file", dest="users_file",
+        help="File with one user ID per line ('-' for stdin)"
+    )
+    parser_member.add_argument(
+        "-w", "--workers", dest="workers", type=int, default=4,
+        help="Concurrent lookups with --users-file (default: 4)"
+    )
+    parser_member.add_argument(
+        "-o", "--output", dest="output", default=None,
+        help="Append one JSON line per member to this file (with --users-file)"
+    )
+    parser_member.add_argument(
+        "--cache-file", dest="cache_file", default=".member_cache.sqlite",
+        help="SQLite file caching getChatMember results of --users-file lookups\n"
+             "(default: .member_cache.sqlite)"
+    )
+    parser_member.add_argument(
+        "--cache-ttl", dest="cache_ttl", type=float, default=3600.0,
+        help="Seconds a cached member stays valid (default: 3600)"
+    )
+    parser_member.add_argument(
+        "--no-cache", dest="use_cache", action="store_false",
+        help="Always ask Telegram and do not touch the cache file"
+    )
 
     # get-rights
     parser_rights = subparsers.add_parser(
@@ -486,7 +3260,7 @@ def build_arg_parser():
 
     # dump-messages
     parser_dump = subparsers.add_parser(
-        "dump-messages", help="Forward & save messages to JSON", parents=[common]
+        "dump-messages", help="Forward & save messages to JSON Lines", parents=[common]
     )
     parser_dump.add_argument(
         "-m", "--message-id", dest="message_id", type=int, required=True,
@@ -498,60 +3272,351 @@ def build_arg_parser():
     )
     parser_dump.add_argument(
         "-o", "--output-file", dest="output_file", type=str, required=True,
-        help="Path to JSON output file"
+        help="Path to output file"
+    )
+    parser_dump.add_argument(
+        "-f", "--format", dest="output_format", choices=OUTPUT_FORMATS, default="jsonl",
+        help="Output format: one JSON object per line (jsonl, default), a JSON array\n"
+             "(json) or a SQLite database with a full-text index (sqlite, see 'search')"
+    )
+    parser_dump.add_argument(
+        "-r", "--resume", dest="resume", action="store_true",
+        help="Continue an interrupted dump from its checkpoint, appending to the output file"
+    )
+    parser_dump.add_argument(
+        "-b", "--batch-size", dest="batch_size", type=int, default=1,
+        help="Messages per forwardMessages/copyMessages call, 1-100 (default: 1).\n"
+             "Batched records hold the source and new message IDs, not the content."
+    )
+    parser_dump.add_argument(
+        "--batch-method", dest="batch_method", choices=("forward", "copy"), default="forward",
+        help="Use forwardMessages (default) or copyMessages in batch mode"
+    )
+    parser_dump.add_argument(
+        "--skip-gaps", dest="skip_gaps", type=int, default=0, metavar="MISSES",
+        help="After this many consecutive missing IDs, probe ahead with growing strides\n"
+             "to jump over deleted ranges (default: 0 = off)"
+    )
+    parser_dump.add_argument(
+        "--max-stride", dest="max_stride", type=int, default=DEFAULT_MAX_STRIDE,
+        help=f"Largest jump made while probing a gap (default: {DEFAULT_MAX_STRIDE}).\n"
+             "Live messages wholly inside a jump are missed; they are recorded in the\n"
+             "checkpoint and rescanned by --resume"
     )
     parser_dump.add_argument(
         "-n", "--max-iterations", dest="max_iterations", type=int, default=16000,
-        help="Maximum number of messages to attempt (default: 16000)"
+        help="Maximum number of message IDs to attempt (default: 16000)"
+    )
+    parser_dump.add_argument(
+        "-w", "--workers", dest="workers", type=int, default=1,
+        help="Number of concurrent forwardMessage requests (default: 1); the\n"
+             "per-chat limit (--chat-rate) still applies to all of them"
+    )
+
+    # run-jobs
+    parser_jobs = subparsers.add_parser(
+        "run-jobs", help="Run several dump-messages jobs in parallel", parents=[network]
+    )
+    parser_jobs.add_argument(
+        "-j", "--jobs", dest="jobs_file", type=str, required=True,
+        help="Job file: JSON array or JSON Lines of {chat, start, stop, output, ...}\n"
+             "objects ('-' reads stdin)"
+    )
+    parser_jobs.add_argument(
+        "-t", "--token", dest="token", action="append", default=None,
+        help="Bot token for jobs that do not set their own (may be repeated)"
+    )
+    parser_jobs.add_argument(
+        "-p", "--parallel", dest="parallel", type=int, default=4,
+        help="Maximum number of jobs running at once (default: 4)"
+    )
+    parser_jobs.add_argument(
+        "-w", "--workers", dest="workers", type=int, default=1,
+        help="Concurrent requests per job unless the job sets 'workers' (default: 1)"
+    )
+    parser_jobs.add_argument(
+        "-r", "--resume", dest="resume", action="store_true",
+        help="Resume every job from its checkpoint"
+    )
+
+    # search
+    parser_search = subparsers.add_parser(
+        "search", help="Full-text search in a dump written with -f sqlite"
+    )
+    parser_search.add_argument(
+        "-d", "--database", dest="database", required=True,
+        help="SQLite file written by 'dump-messages -f sqlite'"
+    )
+    parser_search.add_argument(
+        "-q", "--query", dest="query", required=True,
+        help='FTS5 query: words, "exact phrases", prefix*, AND / OR / NOT'
+    )
+    parser_search.add_argument(
+        "-c", "--chat", dest="chat", type=int, default=None,
+        help="Only search messages of this chat"
+    )
+    parser_search.add_argument(
+        "-n", "--limit", dest="limit", type=int, default=20,
+        help="Maximum number of matches, best first (default: 20)"
+    )
+    parser_search.add_argument(
+        "--json", dest="as_json", action="store_true",
+        help="Print the stored message objects as JSON lines"
     )
 
     return parser
 
 
 # -------------------------------------------------------------------
-# 4. main() function to dispatch calls
+# 6. main() function to dispatch calls
 # -------------------------------------------------------------------
 
-def main():
+def main(argv=None):
     parser = build_arg_parser()
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+
+    # Works on a local database only: no token, no network settings
+    if args.command == "search":
+        search_messages(args.database, args.query, chat_id=args.chat, limit=args.limit,
+                        as_json=args.as_json)
+        return
+
+    # -t may be repeated; only dump-messages and run-jobs can use more than one token
+    args.tokens = args.token or []
+    if len(args.tokens) > 1 and args.command not in ("dump-messages", "run-jobs"):
+        parser.error(f"{args.command} accepts a single -t token")
+    args.token = args.tokens[0] if args.tokens else None
+
+    if args.progress_json:
+        enable_events()
+    emit_event("start", command=args.command)
+
+    with use_api_settings(
+        args.rate,
+        args.chat_rate,
+        base_url=args.api_url,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        pool_size=max(10, 2 * getattr(args, "workers", 1))
+    ):
+        run_instrumented(args)
+
+
+def run_instrumented(args):
+    """
+    Runs the parsed command under --trace, --metrics and --profile.
+    """
+    trace = None
+    if args.trace:
+        try:
+            trace = TraceWriter(args.trace, f"telegram-tools {args.command}")
+        except OSError as e:
+            print(f"[ERROR] Cannot open trace file: {e}", file=sys.stderr)
+            return
+        trace_writer.set(trace)
+    metrics = None
+    if args.metrics or args.metrics_textfile:
+        metrics = ApiMetrics(args.command)
+        api_metrics.set(metrics)
+        if args.metrics_textfile:
+            metrics.start_textfile(args.metrics_textfile, args.metrics_interval)
+    profiler = None
+    if args.profile:
+        profiler = SamplingProfiler(args.profile_interval)
+        profiler.start()
+    try:
+        with trace_span(args.command, "command"):
+            run_command(args)
+    finally:
+        if profiler:
+            report_profile(profiler, args.profile)
+        if trace:
+            trace.close()
+            print(f"[INFO] Trace of {trace.spans} spans written to '{trace.path}'.", file=sys.stderr)
+        if metrics:
+            report_metrics(metrics, args)
+
+
+def report_profile(profiler: SamplingProfiler, path: str):
+    """
+    Final --profile output: the collapsed stacks file plus the functions
+    most often on top of the stack, on stderr.
+    """
+    profiler.stop()
+    total = sum(profiler.samples.values())
+    try:
+        profiler.write(path)
+    except OSError as e:
+        print(f"[ERROR] Cannot write profile: {e}", file=sys.stderr)
+        return
+    print(f"[INFO] Profile of {total} samples over {profiler.elapsed:.2f}s written to '{path}'.",
+          file=sys.stderr)
+    for function, samples in profiler.top():
+        print(f"  {100 * samples / total:5.1f}%  {function}", file=sys.stderr)
+
 
+def report_metrics(metrics: ApiMetrics, args):
+    """
+    Final --metrics output: JSON summary (file or stderr, and a "metrics"
+    event) plus the last update of the Prometheus textfile.
+    """
+    summary = metrics.summary()
+    emit_event("metrics", **summary)
+    try:
+        metrics.stop_textfile()
+        if args.metrics == "-":
+            print(json.dumps(summary, indent=2), file=sys.stderr)
+        elif args.metrics:
+            with open(args.metrics, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+            print(f"[INFO] Metrics written to '{args.metrics}'.", file=sys.stderr)
+    except OSError as e:
+        print(f"[ERROR] Cannot write metrics: {e}", file=sys.stderr)
+
+
+def run_command(args):
+    """
+    Runs the subcommand selected in the parsed 'args'.
+    """
     if args.command == "add-members":
-        generate_and_add_user(args.token, args.chat, args.user)
+        if args.users_file:
+            failed = add_members_bulk(args.token, args.chat, read_user_ids(args.users_file),
+                                      workers=args.workers, report_file=args.report)
+            if failed != 0:
+                sys.exit(1)
+        else:
+            generate_and_add_user(args.token, args.chat, args.user)
 
     elif args.command == "get-admins":
         list_chat_administrators(args.token, args.chat)
 
     elif args.command == "listen-users":
-        listen_for_new_users(args.token, args.chat, timeout=args.duration)
+        if args.webhook_url or not args.register:
+            listen_via_webhook(args.token, args.chat, args.webhook_url, timeout=args.duration,
+                               host=args.listen_host, port=args.listen_port,
+                               secret=args.webhook_secret, certfile=args.cert, keyfile=args.key,
+                               register=args.register, queue_size=args.queue_size)
+        else:
+            listen_for_new_users(args.token, args.chat, timeout=args.duration,
+                                 offset_file=args.offset_file, poll_timeout=args.poll_timeout)
 
     elif args.command == "get-invite":
         get_invite_link(args.token, args.chat)
 
     elif args.command == "get-member":
-        get_chat_member_info(args.token, args.chat, args.user)
+        # A single lookup stays live; only bulk audits go through the cache
+        cache = (MemberCache(args.cache_file, args.cache_ttl)
+                 if args.use_cache and args.users_file else None)
+        try:
+            if args.users_file:
+                failed = get_members_bulk(args.token, args.chat, read_user_ids(args.users_file),
+                                          workers=args.workers, cache=cache,
+                                          output_file=args.output)
+            else:
+                failed = 0
+                get_chat_member_info(args.token, args.chat, args.user, cache=cache)
+        finally:
+            if cache:
+                cache.close()
+        if failed:
+            sys.exit(1)
 
     elif args.command == "get-rights":
         get_bot_permissions(args.token, args.chat)
 
     elif args.command == "dump-messages":
-        dump_messages(
-            bot_token=args.token,
+        result = dump_messages(
+            bot_token=args.tokens,
             chat_id=str(args.chat),
             start_id=args.message_id,
             stop_id=args.stop_id,
             output_file=args.output_file,
-            max_iters=args.max_iterations
+            max_iters=args.max_iterations,
+            workers=args.workers,
+            output_format=args.output_format,
+            resume=args.resume,
+            batch_size=args.batch_size,
+            batch_method=args.batch_method,
+            skip_gaps=args.skip_gaps,
+            max_stride=args.max_stride,
+            progress=lambda counters: emit_event("progress", command="dump-messages", **counters)
         )
+        if result:
+            emit_event("result", command="dump-messages", **result)
+
+    elif args.command == "run-jobs":
+        try:
+            jobs = load_jobs(args.jobs_file)
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] Cannot read job file: {e}", file=sys.stderr)
+            sys.exit(1)
+        options = {
+            "tokens": args.tokens,
+            "rate": args.rate,
+            "chat_rate": args.chat_rate,
+            "api_url": args.api_url,
+            "connect_timeout": args.connect_timeout,
+            "read_timeout": args.read_timeout,
+            "workers": args.workers,
+            "resume": args.resume,
+            "metrics": api_metrics.get() is not None,
+        }
+        try:
+            ok = run_jobs(jobs, options, parallel=args.parallel)
+        except ValueError as e:
+            print(f"[ERROR] {e}", file=sys.stderr)
+            sys.exit(1)
+        if not ok:
+            sys.exit(1)
 
     else:
         print("[ERROR] Unknown command. Use --help to see available subcommands.", file=sys.stderr)
         sys.exit(1)
 
 
+def run_in_process(argv: list, sink, stop=None) -> int:
+    """
+    Runs one command line (without the program name) in the calling thread
+    and returns its exit status. Used by the GUI instead of spawning a new
+    interpreter per command: imports, the rate governor and the pooled
+    client's connections are reused across runs.
+
+    Everything the command prints, and its events, goes to
+    sink(kind, data): kind is "stdout" or "stderr" with a text fragment, or
+    "event" with an event dict (see emit_event). Other threads keep their
+    own output. Setting the 'stop' threading.Event ends dumps, listeners and
+    bulk operations early, as Ctrl+C does on the command line.
+    """
+    if not isinstance(sys.stdout, RoutedStream):
+        sys.stdout = RoutedStream(sys.stdout, "stdout")
+    if not isinstance(sys.stderr, RoutedStream):
+        sys.stderr = RoutedStream(sys.stderr, "stderr")
+
+    def run():
+        output_sink.set(sink)
+        stop_request.set(stop)
+        try:
+            main(argv)
+        except SystemExit as e:
+            return e.code if isinstance(e.code, int) else int(e.code is not None)
+        except Exception as e:
+            print(f"[ERROR] {type(e).__name__}: {e}", file=sys.stderr)
+            return 1
+        return 0
+
+    status = contextvars.copy_context().run(run)
+    sink("event", {"event": "exit", "time": round(time.time(), 3), "status": status})
+    return status
+
+
 # -------------------------------------------------------------------
-# 5. Entry point
+# 7. Entry point
 # -------------------------------------------------------------------
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except SystemExit as e:
+        emit_event("exit", status=e.code if isinstance(e.code, int) else int(e.code is not None))
+        raise
+    emit_event("exit", status=0)